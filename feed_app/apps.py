@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FeedAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'feed_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .utils import connections, metrics  # noqa: F401  (wrap and count DB connections as they open)
@@ -0,0 +1,102 @@
+import functools
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# --- Primary / read-replica routing ---
+# Repository reads marked @replica_read (the feed listing, its serialization reads, single feeds and
+# comment pages) are spread over the aliases in DATABASE_REPLICAS. Everything else stays on the
+# primary: writes, reads inside a transaction, reads not marked, and every read of a client that
+# wrote recently. The last one is what ReplicaPinMiddleware is for: a request that writes pins the
+# rest of itself, and the client's next DATABASE_REPLICA_PIN_SECONDS of requests, to the primary,
+# so new posts and comments show up at once despite replication lag.
+
+_replica_ok = ContextVar('feed_replica_read', default=False)
+_force_primary = ContextVar('feed_force_primary', default=False)
+_current = ContextVar('feed_db_routing', default=None)
+
+
+class RequestRouting:
+    """Per-request state; a plain object so writes in sync_to_async threads update the request's copy."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def start_request(pinned=False):
+    state = RequestRouting(pinned)
+    return state, _current.set(state)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def replica_read(func):
+    """Lets the queries run by a repository method (sync or async) go to a replica."""
+    if iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = _replica_ok.set(True)
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                _replica_ok.reset(token)
+    else:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = _replica_ok.set(True)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _replica_ok.reset(token)
+    return wrapper
+
+
+@contextmanager
+def primary_reads(enabled=True):
+    """Keeps @replica_read methods on the primary inside the block (when `enabled`)."""
+    token = _force_primary.set(True) if enabled else None
+    try:
+        yield
+    finally:
+        if token is not None:
+            _force_primary.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or not _replica_ok.get() or _force_primary.get():
+            return DEFAULT_DB_ALIAS
+        state = _current.get()
+        if state is not None and state.pinned:
+            return DEFAULT_DB_ALIAS
+        # A transaction reads its own uncommitted writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows, so objects read from any of them may be related to each other
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
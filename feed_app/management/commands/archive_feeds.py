@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from feed_app.services import ArchiveService
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves deactivated feeds, and feeds older than FEED_ARCHIVE_AFTER_DAYS, with their images, comments "
+        "and reports into the archive tables, one batch per transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.FEED_ARCHIVE_AFTER_DAYS,
+                            help="Archive active feeds created more than this many days ago.")
+        parser.add_argument('--inactive-only', action='store_true', help="Only archive deactivated feeds.")
+        parser.add_argument('--batch-size', type=int, default=settings.FEED_ARCHIVE_BATCH_SIZE,
+                            help="Feeds moved per transaction.")
+
+    def handle(self, *args, days, inactive_only, batch_size, **options):
+        created_before = None if inactive_only else timezone.now() - timedelta(days=days)
+        archived = 0
+        while True:
+            moved = ArchiveService.archive_batch(created_before, batch_size)
+            if not moved:
+                break
+            archived += moved
+
+        self.stdout.write(f"Archived {archived} feeds.")
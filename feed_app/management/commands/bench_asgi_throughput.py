@@ -0,0 +1,81 @@
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent throughput of the feed list under WSGI vs ASGI. Start both deployments against the same "
+        "database and cache first, e.g. `gunicorn social_feed_project.wsgi -w 4 --threads 8 -b :8000` and "
+        "`uvicorn social_feed_project.asgi:application --workers 4 --port 8001`."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000/api/v1/feeds/?limit=10',
+                            help="Sync endpoint served by the WSGI deployment.")
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001/api/v1/async/feeds/?limit=10',
+                            help="Async endpoint served by the ASGI deployment.")
+        parser.add_argument('--username', required=True, help="Existing user whose session authenticates the requests.")
+        parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight at once.")
+        parser.add_argument('--requests', type=int, default=2000, help="Timed requests per deployment.")
+
+    def handle(self, *args, wsgi_url, asgi_url, username, concurrency, requests, **options):
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            raise CommandError(f"No user named {username!r}.")
+
+        # A real session row, so both servers authenticate exactly as they would a browser
+        client = Client()
+        client.force_login(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        self.stdout.write(f"{requests} requests per deployment, {concurrency} concurrent")
+        for name, url in (('WSGI', wsgi_url), ('ASGI', asgi_url)):
+            self._run(name, url, cookie, concurrency, requests)
+
+    def _run(self, name, url, cookie, concurrency, requests):
+        parts = urlsplit(url)
+        path = f'{parts.path}?{parts.query}' if parts.query else parts.path
+        local = threading.local()
+
+        def fetch(_):
+            # One keep-alive connection per client thread
+            if getattr(local, 'connection', None) is None:
+                local.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            start = time.perf_counter()
+            try:
+                local.connection.request('GET', path, headers={'Cookie': cookie})
+                response = local.connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                local.connection.close()
+                local.connection = None
+                ok = False
+            return (time.perf_counter() - start) * 1000, ok
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(fetch, range(concurrency)))  # warm connections and the page cache
+            started = time.perf_counter()
+            results = list(pool.map(fetch, range(requests)))
+            elapsed = time.perf_counter() - started
+
+        samples = sorted(ms for ms, ok in results if ok)
+        errors = len(results) - len(samples)
+        if not samples:
+            self.stdout.write(f"  {name}: every request failed ({url})")
+            return
+
+        self.stdout.write(
+            f"  {name} {len(samples) / elapsed:8.1f} req/s  mean {statistics.mean(samples):.1f} ms  "
+            f"p50 {samples[len(samples) // 2]:.1f} ms  p95 {samples[int(len(samples) * 0.95)]:.1f} ms  "
+            f"p99 {samples[int(len(samples) * 0.99)]:.1f} ms  errors {errors}"
+        )
@@ -0,0 +1,163 @@
+import itertools
+import json
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from feed_app.models import Feed
+from feed_app.utils.pagination import encode_cursor
+
+from .seed_feed_data import SEED_USERNAME_PREFIX, WORDS
+
+ENDPOINTS = ('list', 'list_cursor', 'search', 'comments', 'create', 'comment', 'report')
+BENCH_USERNAME = 'bench_user'
+# Offline and repeatable: no Redis, no shared state with a running deployment, no throttling
+BENCH_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'bench-feed-api'}}
+
+
+def _percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        "In-process benchmark of the feed API (list, cursor list, search, comments, create, comment, report): "
+        "p50/p95/p99 latency, throughput and SQL queries per request, using a locmem cache against the "
+        "configured database (SQLite or a local Postgres). With --sizes the data is first grown to each "
+        "size with seed_feed_data, so point it at a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='',
+                            help="Comma-separated feed counts, e.g. 10000,100000,1000000. Default: the current data.")
+        parser.add_argument('--requests', type=int, default=200, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=20, help="Untimed requests per endpoint first.")
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help="Comma-separated subset of endpoints.")
+        parser.add_argument('--output', help="Also write the results as JSON to this path (for comparing runs).")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the requests and seeded data.")
+
+    def handle(self, *args, sizes, requests, warmup, endpoints, output, seed, **options):
+        endpoints = [name for name in endpoints.split(',') if name]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}.")
+        try:
+            sizes = sorted(int(size) for size in sizes.split(',') if size)
+        except ValueError:
+            raise CommandError("--sizes must be comma-separated integers.")
+
+        results = {}
+        overrides = {'CACHES': BENCH_CACHES, 'FEED_THROTTLE_RATES': {}, 'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        with override_settings(**overrides):
+            for size in sizes or [None]:
+                if size is not None:
+                    self._grow_to(size, seed)
+                feed_count = Feed.objects.count()
+                if not feed_count:
+                    raise CommandError("No feeds to benchmark; run seed_feed_data or pass --sizes.")
+
+                self.stdout.write(f"{feed_count} feeds, {requests} requests per endpoint ({connection.vendor})")
+                rng = random.Random(seed)
+                results[feed_count] = {}
+                for name in endpoints:
+                    stats = self._measure(self._request_factory(name, rng, requests + warmup), requests, warmup)
+                    results[feed_count][name] = stats
+                    self.stdout.write(
+                        f"  {name:<12} p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms  "
+                        f"p99 {stats['p99_ms']:7.2f} ms  {stats['throughput_rps']:8.1f} req/s  "
+                        f"{stats['queries_per_request']:5.1f} queries  errors {stats['errors']}"
+                    )
+
+        if output:
+            with open(output, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    def _grow_to(self, size, seed):
+        missing = size - Feed.objects.count()
+        if missing <= 0:
+            return
+        has_users = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).exists()
+        self.stdout.write(f"Seeding {missing} feeds...")
+        call_command('seed_feed_data', feeds=missing, users=0 if has_users else 1000, seed=seed + size, stdout=self.stdout)
+
+    def _measure(self, make_request, requests, warmup):
+        for _ in range(warmup):
+            make_request()
+
+        samples, queries, errors = [], 0, 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            # Reads may be routed to a replica alias, so every configured database is counted
+            with ExitStack() as stack:
+                captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in settings.DATABASES]
+                start = time.perf_counter()
+                response = make_request()
+                samples.append((time.perf_counter() - start) * 1000)
+            queries += sum(len(context.captured_queries) for context in captured)
+            errors += response.status_code >= 400
+        elapsed = time.perf_counter() - started
+
+        samples.sort()
+        return {
+            'requests': requests,
+            'p50_ms': _percentile(samples, 0.50),
+            'p95_ms': _percentile(samples, 0.95),
+            'p99_ms': _percentile(samples, 0.99),
+            'throughput_rps': requests / elapsed,
+            'queries_per_request': queries / requests,
+            'errors': errors,
+        }
+
+    def _request_factory(self, name, rng, count):
+        """A zero-argument callable issuing one `name` request; targets are picked up front, outside the timing."""
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        client = Client()
+        client.force_login(user)
+
+        if name == 'list':
+            return lambda: client.get('/api/v1/feeds/', {'limit': 10})
+        if name == 'search':
+            return lambda: client.get('/api/v1/feeds/search/', {'q': rng.choice(WORDS), 'limit': 10})
+        if name == 'create':
+            return lambda: client.post('/api/v1/feeds/', {'text_content': ' '.join(rng.choices(WORDS, k=12))})
+
+        # Each report must hit a feed the bench user has not reported yet, or it takes the no-op path
+        feeds = itertools.cycle(self._random_feeds(rng, count, unreported_by=user if name == 'report' else None))
+        if name == 'list_cursor':
+            return lambda: client.get('/api/v1/feeds/', {'cursor': encode_cursor(*next(feeds)[::-1]), 'limit': 10})
+        if name == 'comments':
+            return lambda: client.get(f'/api/v1/feeds/{next(feeds)[0]}/comments/', {'limit': 20})
+        if name == 'comment':
+            return lambda: client.post(
+                f'/api/v1/feeds/{next(feeds)[0]}/comments/',
+                {'text_content': ' '.join(rng.choices(WORDS, k=6))}, content_type='application/json',
+            )
+        return lambda: client.post(f'/api/v1/feeds/{next(feeds)[0]}/report/')
+
+    def _random_feeds(self, rng, count, unreported_by=None):
+        """Up to `count` distinct random active feeds as (id, created_at)."""
+        queryset = Feed.objects.filter(is_active=True)
+        if unreported_by is not None:
+            queryset = queryset.exclude(feedreport__user=unreported_by)
+        ids = queryset.order_by('id').values_list('id', flat=True)
+        first_id, last_id = ids.first(), ids.last()
+        if first_id is None:
+            raise CommandError("No active feeds left to target.")
+
+        # Probe random ids rather than ORDER BY random(), which sorts the whole table
+        picked = {}
+        for _ in range(count * 3):
+            feed = queryset.filter(id__gte=rng.randint(first_id, last_id)).order_by('id').values_list('id', 'created_at').first()
+            if feed:
+                picked[feed[0]] = feed
+            if len(picked) == count:
+                break
+        return list(picked.values())
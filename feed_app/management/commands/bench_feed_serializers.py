@@ -0,0 +1,65 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from feed_app.models import Comment, Feed
+from feed_app.repositories import COMMENT_PREVIEW_SIZE, FeedRepository
+from feed_app.serializers import FeedListSerializer, FeedListFastSerializer
+from feed_app.services import FeedService
+
+
+class Command(BaseCommand):
+    help = "Microbenchmark: per-page serialization time of FeedListSerializer vs FeedListFastSerializer."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10, help="Feeds per page.")
+        parser.add_argument('--iterations', type=int, default=200, help="Timed serializations per serializer.")
+
+    def handle(self, *args, limit, iterations, **options):
+        # The first page the API serves, loaded both ways once; only serialization + rendering is timed
+        feed_ids = [feed_id for feed_id, _ in FeedService._page_entries(None, limit)]
+        if not feed_ids:
+            raise CommandError("No active feeds to serialize; seed some data first.")
+        position = {feed_id: i for i, feed_id in enumerate(feed_ids)}
+        feed_rows = sorted(FeedRepository.get_feed_rows_by_ids(feed_ids), key=lambda row: position[row['id']])
+        image_rows, comment_rows = FeedRepository.get_listing_children(feed_rows)
+        # The ModelSerializer baseline gets its relations prefetched, so it runs no queries while timed either
+        latest_comments = Comment.objects.select_related('user').order_by('-created_at', '-id')[:COMMENT_PREVIEW_SIZE]
+        feeds = sorted(
+            Feed.objects.filter(id__in=feed_ids).select_related('user').prefetch_related(
+                'images', Prefetch('comments', queryset=latest_comments, to_attr='latest_comments'),
+            ),
+            key=lambda feed: position[feed.id],
+        )
+
+        renderer = JSONRenderer()
+        drf_body = renderer.render(FeedListSerializer(feeds, many=True).data)
+        fast_body = renderer.render(FeedListFastSerializer(feed_rows, image_rows, comment_rows).data)
+        if drf_body != fast_body:
+            raise CommandError("FeedListFastSerializer output differs from FeedListSerializer.")
+
+        def timed(serialize):
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                renderer.render(serialize())
+                samples.append((time.perf_counter() - start) * 1000)
+            return samples
+
+        results = {
+            'FeedListSerializer': timed(lambda: FeedListSerializer(feeds, many=True).data),
+            'FeedListFastSerializer': timed(lambda: FeedListFastSerializer(feed_rows, image_rows, comment_rows).data),
+        }
+
+        self.stdout.write(f"{len(feeds)} feeds/page, {len(drf_body)} bytes, {iterations} iterations (output identical)")
+        for name, samples in results.items():
+            samples.sort()
+            self.stdout.write(
+                f"  {name:<24} mean {statistics.mean(samples):.3f} ms  "
+                f"p50 {samples[len(samples) // 2]:.3f} ms  p95 {samples[int(len(samples) * 0.95)]:.3f} ms"
+            )
+        speedup = statistics.mean(results['FeedListSerializer']) / statistics.mean(results['FeedListFastSerializer'])
+        self.stdout.write(f"  speedup x{speedup:.1f}")
@@ -0,0 +1,74 @@
+from datetime import timedelta
+from pathlib import PurePosixPath
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import ProtectedError
+from django.utils import timezone
+
+from feed_app.models import FeedImage, ImageBlob
+from feed_app.repositories import ImageBlobRepository
+from feed_app.utils.image_variants import VARIANT_SPECS
+
+
+class Command(BaseCommand):
+    help = "Deletes unreferenced image blobs; --adopt first moves pre-deduplication uploads into blob storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--adopt', action='store_true',
+                            help="Hash legacy FeedImage files into content-addressed blobs, dropping duplicates.")
+        parser.add_argument('--grace-minutes', type=int, default=60,
+                            help="Only collect blobs unreferenced for at least this long.")
+
+    def handle(self, *args, adopt, grace_minutes, **options):
+        if adopt:
+            self._adopt_legacy_images()
+
+        cutoff = timezone.now() - timedelta(minutes=grace_minutes)
+        storage = FeedImage._meta.get_field('image').storage
+        collected = 0
+        for name in ImageBlob.objects.filter(ref_count=0, updated_at__lt=cutoff).values_list('name', flat=True):
+            try:
+                with transaction.atomic():
+                    # Re-check under the row lock: an upload may have re-acquired it meanwhile. The files go
+                    # while the lock is held, and ImageBlobRepository.register() waits for it, so an upload
+                    # of the same bytes either keeps the blob alive or finds the file gone afterwards
+                    locked = ImageBlob.objects.select_for_update().filter(name=name, ref_count=0, updated_at__lt=cutoff)
+                    if not locked.exists():
+                        continue
+                    locked.delete()
+
+                    storage.delete(name)
+                    stem = PurePosixPath(name).stem
+                    for field_name, (_, _, extension) in VARIANT_SPECS.items():
+                        FeedImage._meta.get_field(field_name).storage.delete(
+                            f'feed_images/variants/{stem}_{field_name}.{extension}'
+                        )
+            except ProtectedError:
+                continue
+            collected += 1
+
+        self.stdout.write(f"Collected {collected} unreferenced blobs.")
+
+    def _adopt_legacy_images(self):
+        storage = FeedImage._meta.get_field('image').storage
+        legacy_names = set()
+        adopted = 0
+        for feed_image in FeedImage.objects.filter(blob__isnull=True).exclude(image=''):
+            legacy_name = feed_image.image.name
+            with storage.open(legacy_name, 'rb') as legacy_file:
+                blob_name = storage.save(legacy_name, legacy_file)
+
+            ImageBlobRepository.register([blob_name])
+            with transaction.atomic():
+                ImageBlobRepository.acquire_many([blob_name])
+                FeedImage.objects.filter(id=feed_image.id).update(image=blob_name, blob=blob_name)
+            legacy_names.add(legacy_name)
+            adopted += 1
+
+        # The bytes now live in blob storage; drop the old per-upload copies
+        for legacy_name in legacy_names:
+            if not FeedImage.objects.filter(image=legacy_name).exists():
+                storage.delete(legacy_name)
+
+        self.stdout.write(f"Adopted {adopted} legacy images into blob storage.")
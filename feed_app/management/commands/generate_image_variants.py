@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from feed_app.models import FeedImage
+from feed_app.services import FeedService
+from feed_app.utils.image_variants import generate_image_variants
+
+
+class Command(BaseCommand):
+    help = "Renders thumbnail/medium/WebP variants for feed images that don't have them yet (e.g. older uploads)."
+
+    def handle(self, *args, **options):
+        image_ids = list(FeedImage.objects.filter(thumbnail='').values_list('id', flat=True))
+        failed = 0
+        for image_id in image_ids:
+            try:
+                generate_image_variants(image_id)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Image {image_id}: {e}")
+
+        if image_ids:
+            FeedService._invalidate_feed_cache()
+        self.stdout.write(f"Processed {len(image_ids) - failed} images, {failed} failed.")
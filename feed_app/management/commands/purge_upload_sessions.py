@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from feed_app.models import UploadSession
+from feed_app.utils.uploads import discard_part
+
+
+class Command(BaseCommand):
+    help = "Deletes chunked upload sessions (and their partial files) idle for longer than FEED_UPLOAD_SESSION_TTL_HOURS."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=settings.FEED_UPLOAD_SESSION_TTL_HOURS)
+        stale = list(UploadSession.objects.filter(updated_at__lt=cutoff).values_list('id', flat=True))
+        for session_id in stale:
+            discard_part(session_id)
+        UploadSession.objects.filter(id__in=stale).delete()
+        self.stdout.write(f"Purged {len(stale)} stale upload sessions.")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from feed_app.models import Feed
+from feed_app.repositories import FeedRepository
+from feed_app.services import FeedService
+
+
+class Command(BaseCommand):
+    help = "Recomputes Feed.comment_count and Feed.image_count in id batches, fixing only feeds that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Feeds checked per UPDATE.")
+
+    def handle(self, *args, batch_size, **options):
+        bounds = Feed.objects.aggregate(first=Min('id'), last=Max('id'))
+        if bounds['first'] is None:
+            self.stdout.write("No feeds.")
+            return
+
+        repaired = 0
+        for first_id in range(bounds['first'], bounds['last'] + 1, batch_size):
+            drifted = FeedRepository.repair_counters(first_id, first_id + batch_size - 1)
+            if drifted:
+                # Cached listing entries still carry the old counts
+                FeedService._invalidate_feed_entries(drifted)
+                repaired += len(drifted)
+
+        self.stdout.write(f"Repaired counters on {repaired} feeds.")
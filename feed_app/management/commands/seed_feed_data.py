@@ -0,0 +1,104 @@
+import random
+from io import BytesIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from feed_app.models import Comment, Feed, FeedImage
+from feed_app.repositories import FeedRepository, ImageBlobRepository
+from feed_app.services import FeedService
+from feed_app.utils import timeline
+
+SEED_USERNAME_PREFIX = 'seed_user_'
+SEED_PASSWORD = 'seed-password'
+# Synthetic posts and comments are drawn from this vocabulary, so search has something to match
+WORDS = (
+    'morning coffee weekend trip beach mountain city river garden dinner family friends music concert '
+    'movie book game match team goal project launch release update photo sunset rain snow summer winter '
+    'travel food recipe pizza pasta market festival park dog cat bike run marathon gym yoga study exam'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-inserts synthetic users, feeds, images and comments for load testing (e.g. millions of rows "
+        "with --feeds 1000000). Counters and blob references are kept consistent. Use a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help="New users to create.")
+        parser.add_argument('--feeds', type=int, default=10000, help="New feeds, spread over all seeded users.")
+        parser.add_argument('--max-comments', type=int, default=6, help="Comments per feed: uniform in [0, max].")
+        parser.add_argument('--image-ratio', type=float, default=0.3, help="Share of feeds with 1-4 images.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Feeds per bulk INSERT transaction.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for reproducible data.")
+
+    def handle(self, *args, users, feeds, max_comments, image_ratio, batch_size, seed, **options):
+        rng = random.Random(seed)
+        self._create_users(users)
+        user_ids = list(User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).values_list('id', flat=True))
+        if not user_ids:
+            raise CommandError("No seeded users to author the feeds; pass --users.")
+
+        blob_name = self._placeholder_blob() if image_ratio > 0 else None
+        created = 0
+        while created < feeds:
+            count = min(batch_size, feeds - created)
+            self._create_batch(rng, user_ids, count, max_comments, image_ratio, blob_name)
+            created += count
+            self.stdout.write(f"  {created}/{feeds} feeds")
+
+        # Cached pages and the Redis timeline don't know about rows inserted behind the services' back
+        FeedService._invalidate_feed_cache()
+        timeline.rebuild(FeedRepository.get_timeline_entries)
+        self.stdout.write(f"Seeded {users} users and {feeds} feeds.")
+
+    def _create_users(self, count):
+        start = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).count()
+        password = make_password(SEED_PASSWORD)  # hashing once; it is deliberately slow
+        for first in range(start, start + count, 5000):
+            User.objects.bulk_create([
+                User(username=f'{SEED_USERNAME_PREFIX}{n}', password=password)
+                for n in range(first, min(first + 5000, start + count))
+            ])
+
+    def _placeholder_blob(self):
+        # One real image shared by every seeded FeedImage, like a heavily re-shared upload
+        buffer = BytesIO()
+        Image.new('RGB', (64, 64), (90, 140, 200)).save(buffer, format='JPEG')
+        storage = FeedImage._meta.get_field('image').storage
+        blob_name = storage.save('seed.jpg', ContentFile(buffer.getvalue()))
+        ImageBlobRepository.register([blob_name])
+        return blob_name
+
+    def _text(self, rng, low, high):
+        return ' '.join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+    @transaction.atomic
+    def _create_batch(self, rng, user_ids, count, max_comments, image_ratio, blob_name):
+        plans = [
+            (rng.randint(0, max_comments), rng.randint(1, 4) if blob_name and rng.random() < image_ratio else 0)
+            for _ in range(count)
+        ]
+        feeds = Feed.objects.bulk_create([
+            Feed(user_id=rng.choice(user_ids), text_content=self._text(rng, 5, 30),
+                 comment_count=comments, image_count=images)
+            for comments, images in plans
+        ])
+
+        feed_images = [
+            FeedImage(feed=feed, image=blob_name, blob_id=blob_name, order=order, width=64, height=64)
+            for feed, (_, images) in zip(feeds, plans) for order in range(images)
+        ]
+        FeedImage.objects.bulk_create(feed_images)
+        if feed_images:
+            ImageBlobRepository.acquire_many([blob_name] * len(feed_images))
+
+        Comment.objects.bulk_create([
+            Comment(feed=feed, user_id=rng.choice(user_ids), text_content=self._text(rng, 2, 12))
+            for feed, (comments, _) in zip(feeds, plans) for _ in range(comments)
+        ])
@@ -0,0 +1,130 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import db_router
+from .utils import metrics
+
+slow_request_logger = logging.getLogger('feed_app.slow_requests')
+
+# Holds the time (epoch seconds) until which the client's reads stay on the primary
+REPLICA_PIN_COOKIE = 'feed_db_pin'
+
+# Anything else is counted as 'other', so clients can't mint label values
+_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """
+    Records wall time, SQL time and statement count, cache hits/misses and response size per route
+    (URL name, e.g. feed-list, feed-comments, async_feed_list) into utils.metrics. Keep it first in
+    MIDDLEWARE so the numbers cover the whole stack. Works under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        start = time.perf_counter()
+        stats, token = metrics.start_request(capture_sql=settings.METRICS_SLOW_REQUEST_SECONDS is not None)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self._record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        stats, token = metrics.start_request(capture_sql=settings.METRICS_SLOW_REQUEST_SECONDS is not None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self._record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    def _record(self, request, response, stats, elapsed):
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        method = request.method if request.method in _METHODS else 'other'
+        labels = (('route', route), ('method', method))
+
+        metrics.inc('feed_http_requests_total', labels + (('status', str(response.status_code)),))
+        metrics.observe('feed_http_request_duration_seconds', labels, elapsed)
+        metrics.observe('feed_http_db_duration_seconds', labels, stats.db_time)
+        metrics.observe('feed_http_db_queries', labels, stats.queries)
+        if not response.streaming:
+            metrics.observe('feed_http_response_size_bytes', labels, len(response.content))
+        for (cache_name, result), count in stats.cache.items():
+            if count:
+                metrics.inc('feed_cache_requests_total', (('route', route), ('cache', cache_name), ('result', result)), count)
+
+        threshold = settings.METRICS_SLOW_REQUEST_SECONDS
+        if threshold is not None and elapsed >= threshold:
+            statements = '\n'.join(f'  {ms:8.2f} ms  {sql}' for ms, sql in stats.sql)
+            slow_request_logger.warning(
+                f"Slow request {request.method} {request.path} ({route}) -> {response.status_code}: "
+                f"{elapsed * 1000:.1f} ms, {stats.queries} queries in {stats.db_time * 1000:.1f} ms\n{statements}"
+            )
+
+
+class ReplicaPinMiddleware:
+    """
+    Read-your-writes for db_router: a request that writes gets a cookie that keeps the client's
+    reads on the primary for DATABASE_REPLICA_PIN_SECONDS. Unsafe methods (POST, PUT, PATCH,
+    DELETE) read from the primary from the start. Works under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        state, token = db_router.start_request(pinned=self._pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            db_router.end_request(token)
+        return self._pin(response, state)
+
+    async def __acall__(self, request):
+        state, token = db_router.start_request(pinned=self._pinned(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            db_router.end_request(token)
+        return self._pin(response, state)
+
+    def _pinned(self, request):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return True
+        try:
+            return float(request.COOKIES.get(REPLICA_PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _pin(self, response, state):
+        if state.wrote:
+            seconds = settings.DATABASE_REPLICA_PIN_SECONDS
+            response.set_cookie(
+                REPLICA_PIN_COOKIE, f'{time.time() + seconds:.0f}', max_age=seconds, httponly=True, samesite='Lax'
+            )
+        return response
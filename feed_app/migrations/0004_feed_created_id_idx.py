@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+from feed_app.utils.migrations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('feed_app', '0003_rename_image_url_feedimage_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='feed',
+            index=models.Index(fields=['-created_at', '-id'], name='feed_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+from feed_app.utils.migrations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('feed_app', '0004_feed_created_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='comment',
+            index=models.Index(fields=['feed', '-created_at', '-id'], name='comment_feed_created_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed_app', '0005_comment_feed_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='feedimage',
+            name='medium',
+            field=models.ImageField(blank=True, upload_to='feed_images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='feedimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, upload_to='feed_images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='feedimage',
+            name='webp',
+            field=models.ImageField(blank=True, upload_to='feed_images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='feedimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
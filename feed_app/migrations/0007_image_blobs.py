@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:13
+
+import django.db.models.deletion
+import feed_app.utils.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed_app', '0006_feedimage_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('digest', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='feedimage',
+            name='image',
+            field=models.ImageField(max_length=255, storage=feed_app.utils.storage.ContentAddressedStorage(), upload_to='feed_images/'),
+        ),
+        migrations.AlterField(
+            model_name='feedimage',
+            name='medium',
+            field=models.ImageField(blank=True, max_length=255, storage=feed_app.utils.storage.ReplacingStorage(), upload_to='feed_images/variants/'),
+        ),
+        migrations.AlterField(
+            model_name='feedimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, max_length=255, storage=feed_app.utils.storage.ReplacingStorage(), upload_to='feed_images/variants/'),
+        ),
+        migrations.AlterField(
+            model_name='feedimage',
+            name='webp',
+            field=models.ImageField(blank=True, max_length=255, storage=feed_app.utils.storage.ReplacingStorage(), upload_to='feed_images/variants/'),
+        ),
+        migrations.AddField(
+            model_name='feedimage',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='feed_images', to='feed_app.imageblob'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:28
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Feed = apps.get_model('feed_app', 'Feed')
+    Comment = apps.get_model('feed_app', 'Comment')
+    FeedImage = apps.get_model('feed_app', 'FeedImage')
+
+    def count_of(model):
+        return Coalesce(Subquery(
+            model.objects.filter(feed=OuterRef('pk')).order_by().values('feed').annotate(n=Count('*')).values('n'),
+            output_field=IntegerField(),
+        ), 0)
+
+    Feed.objects.update(comment_count=count_of(Comment), image_count=count_of(FeedImage))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed_app', '0008_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='image_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
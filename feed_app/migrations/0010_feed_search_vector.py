@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# The column and index exist on PostgreSQL only and are not declared on the model; other
+# backends (SQLite in tests) search with the fallback in FeedRepository.search_feed_entries.
+# The text search configuration must match repositories.SEARCH_CONFIG.
+
+
+def add_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # STORED generated column: Postgres keeps it in sync with text_content on every write
+    schema_editor.execute(
+        "ALTER TABLE feed_app_feed ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('english'::regconfig, coalesce(text_content, ''))) STORED"
+    )
+    # Only active feeds are searchable, so the index leaves the others out
+    schema_editor.execute(
+        "CREATE INDEX feed_search_vector_idx ON feed_app_feed USING GIN (search_vector) WHERE is_active"
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS feed_search_vector_idx")
+    schema_editor.execute("ALTER TABLE feed_app_feed DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed_app', '0009_feed_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_vector, drop_search_vector),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+from feed_app.utils.migrations import AddIndexConcurrentlyOnPostgres, RemoveIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('feed_app', '0010_feed_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='feed',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-created_at', '-id'], name='feed_active_created_id_idx'),
+        ),
+        RemoveIndexConcurrentlyOnPostgres(
+            model_name='feed',
+            name='feed_app_fe_created_fd3593_idx',
+        ),
+        RemoveIndexConcurrentlyOnPostgres(
+            model_name='feed',
+            name='feed_created_id_idx',
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:38
+
+import django.db.models.deletion
+import feed_app.utils.storage
+from django.conf import settings
+from django.db import migrations, models
+
+from feed_app.utils.migrations import AddIndexConcurrentlyOnPostgres
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY (feed_inactive_idx, on the hot feed table) can't run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('feed_app', '0011_feed_active_listing_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedComment',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text_content', models.TextField()),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedFeed',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('text_content', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('is_active', models.BooleanField()),
+                ('report_count', models.IntegerField(default=0)),
+                ('comment_count', models.IntegerField(default=0)),
+                ('image_count', models.IntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedFeedImage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('image', models.ImageField(max_length=255, storage=feed_app.utils.storage.ContentAddressedStorage(), upload_to='')),
+                ('order', models.PositiveSmallIntegerField(default=0)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('thumbnail', models.ImageField(blank=True, max_length=255, storage=feed_app.utils.storage.ReplacingStorage(), upload_to='')),
+                ('medium', models.ImageField(blank=True, max_length=255, storage=feed_app.utils.storage.ReplacingStorage(), upload_to='')),
+                ('webp', models.ImageField(blank=True, max_length=255, storage=feed_app.utils.storage.ReplacingStorage(), upload_to='')),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedFeedReport',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('reason', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='feed',
+            index=models.Index(condition=models.Q(('is_active', False)), fields=['id'], name='feed_inactive_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedfeed',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='feed',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='feed_app.archivedfeed'),
+        ),
+        migrations.AddField(
+            model_name='archivedfeedimage',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='feed_app.imageblob'),
+        ),
+        migrations.AddField(
+            model_name='archivedfeedimage',
+            name='feed',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='feed_app.archivedfeed'),
+        ),
+        migrations.AddField(
+            model_name='archivedfeedreport',
+            name='feed',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reports', to='feed_app.archivedfeed'),
+        ),
+        migrations.AddField(
+            model_name='archivedfeedreport',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedfeed',
+            index=models.Index(fields=['-created_at', '-id'], name='archived_feed_created_id_idx'),
+        ),
+    ]
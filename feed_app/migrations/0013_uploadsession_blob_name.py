@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feed_app', '0012_feed_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='blob_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
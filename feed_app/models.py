@@ -1,5 +1,7 @@
+import uuid
 from django.db import models
 from django.contrib.auth.models import User
+from .utils.storage import ContentAddressedStorage, ReplacingStorage
 
 # All transactional data goes into PostgreSQL
 
@@ -10,10 +12,17 @@ class Feed(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True) 
     report_count = models.IntegerField(default=0) 
+    # Denormalized so listings never aggregate; kept current by the repositories (repair: repair_feed_counters)
+    comment_count = models.IntegerField(default=0)
+    image_count = models.IntegerField(default=0)
 
     class Meta:
         indexes = [
-            models.Index(fields=['-created_at', 'is_active']),
+            # Every listing read filters is_active and pages on (created_at, id); inactive feeds stay out
+            # of the index. The timeline's (id, created_at) reads are answered from it alone.
+            models.Index(fields=['-created_at', '-id'], name='feed_active_created_id_idx', condition=models.Q(is_active=True)),
+            # Lets the archival job find deactivated feeds without scanning; stays tiny since it moves them out
+            models.Index(fields=['id'], name='feed_inactive_idx', condition=models.Q(is_active=False)),
         ]
         verbose_name = "Feed Post"
 
@@ -26,11 +35,28 @@ class Feed(models.Model):
 
 #     class Meta:
 #         ordering = ['order']
+class ImageBlob(models.Model):
+    """One stored copy of an image's bytes, shared by every FeedImage with the same content."""
+    name = models.CharField(max_length=255, primary_key=True)  # content-addressed storage path
+    digest = models.CharField(max_length=64, db_index=True)  # sha256 hex
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)  # FeedImage + ArchivedFeedImage rows pointing here; 0 = collectable
+    updated_at = models.DateTimeField(auto_now=True)
+
 class FeedImage(models.Model):
     """Stores up to 4 images for a feed post."""
     feed = models.ForeignKey(Feed, related_name='images', on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='feed_images/')  # renamed from image_url
+    image = models.ImageField(upload_to='feed_images/', storage=ContentAddressedStorage(), max_length=255)  # renamed from image_url
+    # Null only for uploads stored before content addressing (see `manage.py gc_image_blobs --adopt`)
+    blob = models.ForeignKey(ImageBlob, null=True, blank=True, related_name='feed_images', on_delete=models.PROTECT)
     order = models.PositiveSmallIntegerField(default=0) 
+    # Filled in off the request path by utils.image_variants
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # Variant names derive from the blob digest, so every re-share of a blob points at the same files
+    thumbnail = models.ImageField(upload_to='feed_images/variants/', storage=ReplacingStorage(), max_length=255, blank=True)
+    medium = models.ImageField(upload_to='feed_images/variants/', storage=ReplacingStorage(), max_length=255, blank=True)
+    webp = models.ImageField(upload_to='feed_images/variants/', storage=ReplacingStorage(), max_length=255, blank=True)
 
     class Meta:
         ordering = ['order']
@@ -42,6 +68,12 @@ class Comment(models.Model):
     text_content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Serves per-feed comment previews and keyset pages newest first
+            models.Index(fields=['feed', '-created_at', '-id'], name='comment_feed_created_idx'),
+        ]
+
 class FeedReport(models.Model):
     """Tracks unique user reports on a feed."""
     feed = models.ForeignKey(Feed, on_delete=models.CASCADE)
@@ -50,4 +82,74 @@ class FeedReport(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('feed', 'user') # Ensures 3 UNIQUE users report
\ No newline at end of file
+        unique_together = ('feed', 'user') # Ensures 3 UNIQUE users report
+
+class UploadSession(models.Model):
+    """A resumable, chunked image upload; its bytes are assembled on local disk until finalized."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    total_size = models.PositiveBigIntegerField()
+    received_size = models.PositiveBigIntegerField(default=0)
+    # Filled from the image header as soon as enough bytes have arrived
+    image_format = models.CharField(max_length=10, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    # Set once finalize has moved the assembled file into blob storage, so a retry can reuse it
+    blob_name = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def is_complete(self):
+        return self.received_size == self.total_size and bool(self.image_format)
+
+
+# --- Cold storage: feeds moved out of the hot tables by `manage.py archive_feeds` ---
+# Rows keep their original ids. Only the archival job writes here; moderation reads them.
+
+class ArchivedFeed(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    text_content = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    is_active = models.BooleanField()  # False: removed by reports before it was archived
+    report_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    image_count = models.IntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='archived_feed_created_id_idx'),
+        ]
+
+class ArchivedFeedImage(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    feed = models.ForeignKey(ArchivedFeed, related_name='images', on_delete=models.CASCADE)
+    image = models.ImageField(storage=ContentAddressedStorage(), max_length=255)
+    # Still counted in ImageBlob.ref_count, so archived images are never garbage-collected
+    blob = models.ForeignKey(ImageBlob, null=True, blank=True, related_name='+', on_delete=models.PROTECT)
+    order = models.PositiveSmallIntegerField(default=0)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    thumbnail = models.ImageField(storage=ReplacingStorage(), max_length=255, blank=True)
+    medium = models.ImageField(storage=ReplacingStorage(), max_length=255, blank=True)
+    webp = models.ImageField(storage=ReplacingStorage(), max_length=255, blank=True)
+
+    class Meta:
+        ordering = ['order']
+
+class ArchivedComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    feed = models.ForeignKey(ArchivedFeed, related_name='comments', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    text_content = models.TextField()
+    created_at = models.DateTimeField()
+
+class ArchivedFeedReport(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    feed = models.ForeignKey(ArchivedFeed, related_name='reports', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    reason = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField()
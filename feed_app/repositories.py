@@ -1,33 +1,224 @@
-from django.core.cache import cache
-from .models import Feed, FeedReport, Comment, FeedImage
-from django.db import transaction
+from .db_router import replica_read
+from .models import (
+    ArchivedComment, ArchivedFeed, ArchivedFeedImage, ArchivedFeedReport,
+    Comment, Feed, FeedImage, FeedReport, ImageBlob, UploadSession,
+)
+from .utils.pagination import encode_cursor, decode_cursor, rows_before
+from .utils.storage import blob_digest
+from asgiref.sync import sync_to_async
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import connection, transaction
+from django.utils import timezone
+from collections import Counter
+from django.db.models import (
+    Case, Count, F, FloatField, IntegerField, OuterRef, Prefetch, Q, Subquery, Value, When, Window,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Coalesce, Greatest, RowNumber
+
+COMMENT_PREVIEW_SIZE = 3  # newest comments embedded per feed in the listing
+SEARCH_CONFIG = 'english'  # text search configuration of the search_vector column (migration 0010)
+
+
+def _child_count(model):
+    # Correlated subquery counting a feed's comments or images, for counter repairs
+    return Coalesce(Subquery(
+        model.objects.filter(feed=OuterRef('pk')).order_by().values('feed').annotate(n=Count('*')).values('n'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+# Columns read by FeedListFastSerializer
+FEED_ROW_FIELDS = ('id', 'user_id', 'user__username', 'text_content', 'created_at', 'comment_count', 'image_count')
+IMAGE_ROW_FIELDS = ('feed_id', 'id', 'image', 'order', 'width', 'height', 'thumbnail', 'medium', 'webp')
+COMMENT_ROW_FIELDS = ('feed_id', 'id', 'user_id', 'user__username', 'text_content', 'created_at')
+
+
+def _listing_rows(queryset):
+    return queryset.values(*FEED_ROW_FIELDS)
+
+
+def _feed_entries(after):
+    queryset = Feed.objects.filter(is_active=True).order_by('-created_at', '-id')
+    if after:
+        queryset = queryset.filter(rows_before(*after))
+    return queryset.values_list('id', 'created_at')
+
+
+def _archivable_querysets(created_before):
+    """
+    Ids of deactivated feeds (feed_inactive_idx), then of active ones created before `created_before`,
+    oldest first (feed_active_created_id_idx). Two reads, since an OR of the two conditions fits neither index.
+    """
+    querysets = [Feed.objects.filter(is_active=False).order_by('id').values_list('id', flat=True)]
+    if created_before is not None:
+        querysets.append(
+            Feed.objects.filter(is_active=True, created_at__lt=created_before)
+            .order_by('created_at', 'id').values_list('id', flat=True)
+        )
+    return querysets
+
+
+def _listing_children_querysets(feed_rows):
+    # The stored counters let feeds without images or comments skip those lookups entirely
+    image_feed_ids = [row['id'] for row in feed_rows if row['image_count']]
+    comment_feed_ids = [row['id'] for row in feed_rows if row['comment_count']]
+
+    image_rows = FeedImage.objects.none()
+    if image_feed_ids:
+        image_rows = FeedImage.objects.filter(feed_id__in=image_feed_ids).order_by('order', 'id').values(*IMAGE_ROW_FIELDS)
+
+    comment_rows = Comment.objects.none()
+    if comment_feed_ids:
+        newest_first = Window(
+            RowNumber(), partition_by=[F('feed_id')], order_by=[F('created_at').desc(), F('id').desc()]
+        )
+        comment_rows = (
+            Comment.objects.filter(feed_id__in=comment_feed_ids)
+            .annotate(position=newest_first)
+            .filter(position__lte=COMMENT_PREVIEW_SIZE)
+            .order_by('created_at', 'id')
+            .values(*COMMENT_ROW_FIELDS)
+        )
+    return image_rows, comment_rows
+
+
+def _search_queryset(query):
+    """Active feeds matching `query`, annotated with a float `rank` (higher is better)."""
+    queryset = Feed.objects.filter(is_active=True)
+    if connection.vendor == 'postgresql':
+        # The generated column is added by migration 0010 on Postgres only, so the model doesn't declare it
+        qn = connection.ops.quote_name
+        document = RawSQL(f"{qn(Feed._meta.db_table)}.{qn('search_vector')}", [], output_field=SearchVectorField())
+        search = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        # ts_rank() is a float4; as float8 it survives the round trip through the cursor exactly
+        return queryset.annotate(document=document).filter(document=search).annotate(
+            rank=Cast(SearchRank(F('document'), search), FloatField())
+        )
+
+    # Fallback for other backends: every word must appear, all matches rank equally (newest first)
+    for word in query.split():
+        queryset = queryset.filter(text_content__icontains=word)
+    return queryset.annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def _comments_page_queryset(feed, cursor, limit):
+    queryset = Comment.objects.filter(feed=feed).select_related('user').order_by('-created_at', '-id')
+    if cursor:
+        queryset = queryset.filter(rows_before(*decode_cursor(cursor)))
+    return queryset[:limit + 1]
+
+
+def _split_comments_page(comments, limit):
+    next_cursor = None
+    if len(comments) > limit:
+        comments = comments[:limit]
+        next_cursor = encode_cursor(comments[-1].created_at, comments[-1].id)
+    return comments, next_cursor
+
 
 class FeedRepository:
     """Handles direct database operations for Feed and related models."""
 
     @staticmethod
-    def get_latest_feeds(offset=0, limit=10):
-        """Fetches active feeds with Redis caching for performance."""
-        cache_key = f'feeds_list_offset_{offset}_limit_{limit}'
-        cached_data = cache.get(cache_key)
-
-        if cached_data is not None:
-            return cached_data
-
-        # Filter only active feeds and order by creation time
-        queryset = Feed.objects.filter(is_active=True).order_by('-created_at')
-        # Pre-fetch related data for efficient listing
-        feeds = list(queryset[offset:offset + limit].prefetch_related('images', 'comments__user'))
-        
-        # Cache for 60 seconds (Meeting < 2 sec requirement)
-        cache.set(cache_key, feeds, 60) 
-        
-        return feeds
+    @replica_read
+    def get_listing_children(feed_rows):
+        """
+        Batched lookups for a page of feed rows: (image_rows, comment_rows).
+        Comments are the newest COMMENT_PREVIEW_SIZE per feed from one ROW_NUMBER() query,
+        returned oldest first as the listing shows them.
+        """
+        image_rows, comment_rows = _listing_children_querysets(feed_rows)
+        return list(image_rows), list(comment_rows)
 
     @staticmethod
+    @replica_read
     def get_feed_by_id(feed_id):
         return Feed.objects.filter(id=feed_id).first()
 
+    @staticmethod
+    def decrement_image_count(feed_id):
+        Feed.objects.filter(id=feed_id, image_count__gt=0).update(image_count=F('image_count') - 1)
+
+    @staticmethod
+    def repair_counters(first_id, last_id):
+        """
+        Recomputes comment_count/image_count for feeds with ids in [first_id, last_id] whose stored
+        values have drifted. Returns the ids that were fixed.
+        """
+        actual = {'actual_comments': _child_count(Comment), 'actual_images': _child_count(FeedImage)}
+        drifted = list(
+            Feed.objects.filter(id__range=(first_id, last_id)).annotate(**actual)
+            .exclude(comment_count=F('actual_comments'), image_count=F('actual_images'))
+            .values_list('id', flat=True)
+        )
+        if drifted:
+            Feed.objects.filter(id__in=drifted).update(
+                comment_count=actual['actual_comments'], image_count=actual['actual_images']
+            )
+        return drifted
+
+    # --- Timeline reads: (id, created_at) entries, hydrated separately from the per-feed cache ---
+
+    @staticmethod
+    def get_timeline_entries(limit):
+        """The newest `limit` active feeds as (id, created_at), for rebuilding the Redis timeline."""
+        return list(
+            Feed.objects.filter(is_active=True).order_by('-created_at', '-id').values_list('id', 'created_at')[:limit]
+        )
+
+    @staticmethod
+    @replica_read
+    def get_feed_entries_page(after=None, limit=10, offset=0):
+        """DB fallback for utils.timeline.page: same arguments, same (id, created_at) entries."""
+        return list(_feed_entries(after)[offset:offset + limit])
+
+    @staticmethod
+    @replica_read
+    def get_feed_rows_by_ids(feed_ids):
+        """Listing rows for the given feeds, skipping any that are no longer active."""
+        return list(_listing_rows(Feed.objects.filter(id__in=feed_ids, is_active=True)))
+
+    @staticmethod
+    def get_image_feed_ids(image_ids):
+        return list(FeedImage.objects.filter(id__in=image_ids).values_list('feed_id', flat=True).distinct())
+
+    @staticmethod
+    @replica_read
+    def search_feed_entries(query, after=None, limit=10):
+        """
+        Up to `limit` (id, rank) entries of active feeds matching `query`, best match first,
+        that sort after the `after` (rank, id) position of the previous page.
+        """
+        queryset = _search_queryset(query)
+        if after:
+            rank, pk = after
+            queryset = queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__lt=pk))
+        return list(queryset.order_by('-rank', '-id').values_list('id', 'rank')[:limit])
+
+    # --- Async ORM variants of the read paths (ASGI views) ---
+
+    @staticmethod
+    @replica_read
+    async def aget_feed_entries_page(after=None, limit=10, offset=0):
+        return [entry async for entry in _feed_entries(after)[offset:offset + limit]]
+
+    @staticmethod
+    @replica_read
+    async def aget_feed_rows_by_ids(feed_ids):
+        return [row async for row in _listing_rows(Feed.objects.filter(id__in=feed_ids, is_active=True))]
+
+    @staticmethod
+    @replica_read
+    async def aget_listing_children(feed_rows):
+        image_rows, comment_rows = _listing_children_querysets(feed_rows)
+        return [row async for row in image_rows], [row async for row in comment_rows]
+
+    @staticmethod
+    @replica_read
+    async def aget_feed_by_id(feed_id):
+        return await Feed.objects.filter(id=feed_id).afirst()
+
     # @staticmethod
     # @transaction.atomic
     # def create_feed(user, text_content, image_urls):
@@ -37,31 +228,282 @@ class FeedRepository:
     #     return feed
 
     @staticmethod
-    @transaction.atomic
-    def create_feed(user, text_content, images):
+    def create_feed(user, text_content, stored_images=()):
         """
-        images: list of uploaded file objects from request.FILES
+        Inserts a Feed and all of its FeedImage rows (one bulk INSERT). Run it inside a transaction.
+        stored_images: (blob_name, width, height) tuples for blobs already stored and registered.
+        Returns (feed, feed_images).
         """
-        feed = Feed.objects.create(user=user, text_content=text_content)
-        for i, image in enumerate(images[:4]):
-            FeedImage.objects.create(feed=feed, image=image, order=i)
-        return feed
+        feed = Feed.objects.create(user=user, text_content=text_content, image_count=len(stored_images))
+        feed_images = FeedImage.objects.bulk_create([
+            FeedImage(feed=feed, image=blob_name, blob_id=blob_name, order=order, width=width, height=height)
+            for order, (blob_name, width, height) in enumerate(stored_images)
+        ])
+        return feed, feed_images
 
 
     @staticmethod
     @transaction.atomic
-    def create_report_and_get_count(feed, user):
-        """Creates the report and returns the *new* unique report count."""
-        report, created = FeedReport.objects.get_or_create(feed=feed, user=user)
-        
-        if created:
-            feed.report_count += 1
-            feed.save(update_fields=['report_count'])
-        
-        return feed.report_count
+    def record_report(feed_id, user, threshold):
+        """
+        Records a unique report and counts it with a single conditional UPDATE ... RETURNING;
+        the same statement deactivates the feed once `threshold` is reached, so concurrent
+        reports never read-modify-write the row.
+        Returns (report_count, is_active, deactivated), or None (storing nothing) if the feed is no longer active.
+        """
+        _, created = FeedReport.objects.get_or_create(feed_id=feed_id, user=user)
+        if not created:
+            current = Feed.objects.filter(id=feed_id, is_active=True).values_list('report_count', 'is_active').first()
+            return (*current, False) if current else None
+
+        qn = connection.ops.quote_name
+        count, active = qn('report_count'), qn('is_active')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {qn(Feed._meta.db_table)} "
+                f"SET {count} = {count} + 1, "
+                f"{active} = CASE WHEN {count} + 1 >= %s THEN %s ELSE {active} END "
+                f"WHERE {qn('id')} = %s AND {active} = %s "
+                f"RETURNING {count}, {active}",
+                [threshold, False, feed_id, True],
+            )
+            row = cursor.fetchone()
+
+        if row is None:
+            # The feed is gone or already inactive: the report must not outlive this call
+            transaction.set_rollback(True)
+            return None
+        report_count, is_active = row[0], bool(row[1])
+        # The WHERE clause only matches active feeds, so an inactive result means this report flipped it
+        return report_count, is_active, not is_active
+
+class UploadSessionRepository:
+    """Handles direct database operations for chunked upload sessions."""
+
+    @staticmethod
+    def create_session(user, filename, total_size):
+        return UploadSession.objects.create(user=user, filename=filename, total_size=total_size)
+
+    @staticmethod
+    def get_session(session_id, user):
+        return UploadSession.objects.filter(id=session_id, user=user).first()
+
+    @staticmethod
+    def lock_received_size(session):
+        """Locks the session row until the transaction ends; returns its received_size, or None if it is gone."""
+        return UploadSession.objects.select_for_update().filter(id=session.id).values_list('received_size', flat=True).first()
+
+    @staticmethod
+    def advance(session, offset, length):
+        """Moves received_size from `offset` to `offset + length` only if it still stands at `offset`. Returns success."""
+        return UploadSession.objects.filter(id=session.id, received_size=offset).update(
+            received_size=offset + length, updated_at=timezone.now()
+        ) == 1
+
+    @staticmethod
+    def set_header_info(session, image_format, width, height):
+        UploadSession.objects.filter(id=session.id).update(image_format=image_format, width=width, height=height)
+
+    @staticmethod
+    def set_blob_name(session, blob_name):
+        UploadSession.objects.filter(id=session.id).update(blob_name=blob_name)
+
+    @staticmethod
+    def get_complete_sessions(user, session_ids):
+        """The user's finished sessions for `session_ids`, in the order given; raises ValueError if any is missing."""
+        sessions = {s.id: s for s in UploadSession.objects.filter(id__in=session_ids, user=user)}
+        ordered = [sessions.get(session_id) for session_id in session_ids]
+        if any(session is None or not session.is_complete for session in ordered):
+            raise ValueError("Every upload must exist and be complete before it can be attached.")
+        return ordered
+
+
+    @staticmethod
+    def delete_sessions(session_ids):
+        UploadSession.objects.filter(id__in=session_ids).delete()
+
+
+class ImageBlobRepository:
+    """Reference counts for content-addressed image blobs."""
+
+    @staticmethod
+    def register(names):
+        """
+        Ensures a row exists for each freshly stored blob. Runs outside the creating transaction
+        (autocommit), so a rolled-back post leaves a zero-reference row that gc_image_blobs can
+        collect rather than an untracked file. Existing rows get updated_at bumped so the GC's
+        grace period protects them until acquire_many() runs.
+        Raises ValueError if gc_image_blobs removed a file between storing and registering it
+        (the upload found the bytes already stored); storing it again writes a new copy.
+        """
+        if not names:
+            return
+        storage = FeedImage._meta.get_field('image').storage
+        names = sorted(set(names))
+        now = timezone.now()
+        try:
+            blobs = [
+                ImageBlob(name=name, digest=blob_digest(name), size=storage.size(name), ref_count=0, updated_at=now)
+                for name in names
+            ]
+        except FileNotFoundError:
+            raise ValueError("An image was removed while it was being stored; please upload it again.")
+        # The upsert waits for a collection holding the row lock, so the files are checked after it
+        ImageBlob.objects.bulk_create(blobs, update_conflicts=True, unique_fields=['name'], update_fields=['updated_at'])
+        if not all(storage.exists(name) for name in names):
+            raise ValueError("An image was removed while it was being stored; please upload it again.")
+
+    @staticmethod
+    def acquire_many(names):
+        """Adds one reference per occurrence in `names` (registered blobs) with a single UPDATE."""
+        if not names:
+            return
+        counts = Counter(names)
+        increment = Case(*[When(name=name, then=Value(n)) for name, n in counts.items()], output_field=IntegerField())
+        ImageBlob.objects.filter(name__in=counts).update(
+            ref_count=F('ref_count') + increment, updated_at=timezone.now()
+        )
+
+    @staticmethod
+    def release(name):
+        """Drops one reference; blobs left at zero are removed by `manage.py gc_image_blobs`."""
+        ImageBlob.objects.filter(name=name, ref_count__gt=0).update(
+            ref_count=F('ref_count') - 1, updated_at=timezone.now()
+        )
+
 
 class CommentRepository:
     """Handles direct database operations for Comment models."""
     @staticmethod
+    @transaction.atomic
     def create_comment(feed, user, text_content):
-        return Comment.objects.create(feed=feed, user=user, text_content=text_content)
\ No newline at end of file
+        comment = Comment.objects.create(feed=feed, user=user, text_content=text_content)
+        Feed.objects.filter(id=feed.id).update(comment_count=F('comment_count') + 1)
+        return comment
+
+    @staticmethod
+    @replica_read
+    def get_comments_page(feed, cursor=None, limit=20):
+        """
+        Keyset page of a feed's comments, newest first.
+        Returns (comments, next_cursor); raises ValueError for a malformed cursor.
+        """
+        return _split_comments_page(list(_comments_page_queryset(feed, cursor, limit)), limit)
+
+    @staticmethod
+    async def acreate_comment(feed, user, text_content):
+        # The insert and the counter bump share a transaction, which the async ORM cannot open
+        return await sync_to_async(CommentRepository.create_comment)(feed, user, text_content)
+
+    @staticmethod
+    def decrement_comment_count(feed_id):
+        Feed.objects.filter(id=feed_id, comment_count__gt=0).update(comment_count=F('comment_count') - 1)
+
+    @staticmethod
+    def discount_user_comments(user):
+        """
+        For a user about to be deleted: takes their comments off the comment_count of other users' feeds
+        in one UPDATE (their own feeds are deleted with them). Returns the ids of the feeds changed.
+        """
+        feed_ids = list(
+            Feed.objects.filter(id__in=Comment.objects.filter(user=user).values('feed_id'))
+            .exclude(user=user).values_list('id', flat=True)
+        )
+        if feed_ids:
+            per_feed = Comment.objects.filter(user=user, feed=OuterRef('pk')).order_by().values('feed').annotate(n=Count('*'))
+            Feed.objects.filter(id__in=feed_ids).update(comment_count=Greatest(
+                F('comment_count') - Subquery(per_feed.values('n'), output_field=IntegerField()), 0
+            ))
+        return feed_ids
+
+    @staticmethod
+    @replica_read
+    async def aget_comments_page(feed, cursor=None, limit=20):
+        comments = [comment async for comment in _comments_page_queryset(feed, cursor, limit)]
+        return _split_comments_page(comments, limit)
+
+
+# (hot model, archive model, column holding the feed id), parents first
+_ARCHIVE_TABLES = (
+    (Feed, ArchivedFeed, 'id'),
+    (FeedImage, ArchivedFeedImage, 'feed_id'),
+    (Comment, ArchivedComment, 'feed_id'),
+    (FeedReport, ArchivedFeedReport, 'feed_id'),
+)
+
+
+def _delete_rows(model, column, feed_ids):
+    # A plain DELETE: the post_delete signals' counter and blob bookkeeping must not run for archived rows
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {qn(model._meta.db_table)} WHERE {qn(column)} IN ({', '.join(['%s'] * len(feed_ids))})",
+            feed_ids,
+        )
+
+
+class ArchiveRepository:
+    """Moves feeds and their children into the archive tables, and reads them back for moderation."""
+
+    @staticmethod
+    def get_archivable_feed_ids(created_before=None, limit=500):
+        """Up to `limit` ids of deactivated feeds, then of active ones created before `created_before` when given."""
+        feed_ids = []
+        for queryset in _archivable_querysets(created_before):
+            feed_ids.extend(queryset[:limit - len(feed_ids)])
+            if len(feed_ids) >= limit:
+                break
+        return feed_ids
+
+    @staticmethod
+    @transaction.atomic
+    def archive_feeds(feed_ids):
+        """
+        Copies these feeds with their images, comments and reports into the archive tables and deletes
+        them from the hot ones, in one transaction. Blob references carry over unchanged.
+        Returns (id, was_active) for each feed moved.
+        """
+        # Row locks hold off comments and reports on these feeds until the move commits
+        moved = list(Feed.objects.select_for_update().filter(id__in=feed_ids).values_list('id', 'is_active'))
+        feed_ids = [feed_id for feed_id, _ in moved]
+        if not feed_ids:
+            return []
+
+        for model, archive_model, column in _ARCHIVE_TABLES:
+            columns = [field.attname for field in archive_model._meta.concrete_fields if field.attname != 'archived_at']
+            rows = model.objects.filter(**{f'{column}__in': feed_ids}).values(*columns)
+            archive_model.objects.bulk_create([archive_model(**row) for row in rows])
+        for model, _, column in reversed(_ARCHIVE_TABLES):
+            _delete_rows(model, column, feed_ids)
+        return moved
+
+    @staticmethod
+    def get_archived_feeds_page(cursor=None, limit=20):
+        """
+        Keyset page of archived feeds, newest first, with their author.
+        Returns (feeds, next_cursor); raises ValueError for a malformed cursor.
+        """
+        queryset = ArchivedFeed.objects.select_related('user').order_by('-created_at', '-id')
+        if cursor:
+            queryset = queryset.filter(rows_before(*decode_cursor(cursor)))
+
+        feeds = list(queryset[:limit + 1])
+        next_cursor = None
+        if len(feeds) > limit:
+            feeds = feeds[:limit]
+            next_cursor = encode_cursor(feeds[-1].created_at, feeds[-1].id)
+        return feeds, next_cursor
+
+    @staticmethod
+    def get_archived_feed(feed_id):
+        """One archived feed with its images, full comment thread and reports."""
+        return (
+            ArchivedFeed.objects.select_related('user')
+            .prefetch_related(
+                'images',
+                Prefetch('comments', queryset=ArchivedComment.objects.select_related('user').order_by('created_at', 'id')),
+                Prefetch('reports', queryset=ArchivedFeedReport.objects.select_related('user').order_by('created_at', 'id')),
+            )
+            .filter(id=feed_id)
+            .first()
+        )
@@ -77,8 +77,12 @@
 
 
 
+from django.conf import settings
 from rest_framework import serializers
-from .models import Feed, FeedImage, Comment
+from .models import (
+    ArchivedComment, ArchivedFeed, ArchivedFeedImage, ArchivedFeedReport, Feed, FeedImage, Comment, UploadSession,
+)
+from .repositories import COMMENT_PREVIEW_SIZE
 from django.contrib.auth.models import User
 
 
@@ -93,7 +97,7 @@ class UserSerializer(serializers.ModelSerializer):
 class FeedImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = FeedImage
-        fields = ('id', 'image', 'order')  # ✅ use image field directly
+        fields = ('id', 'image', 'order', 'width', 'height', 'thumbnail', 'medium', 'webp')  # ✅ use image field directly
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -110,11 +114,79 @@ class CommentSerializer(serializers.ModelSerializer):
 class FeedListSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     images = FeedImageSerializer(many=True, read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
+    comments = serializers.SerializerMethodField()
 
     class Meta:
         model = Feed
-        fields = ('id', 'user', 'text_content', 'images', 'comments', 'created_at')
+        fields = ('id', 'user', 'text_content', 'images', 'comments', 'comment_count', 'created_at')
+
+    def get_comments(self, feed):
+        """Newest comments only (see FeedRepository), rendered oldest first like the full thread."""
+        latest = getattr(feed, 'latest_comments', None)
+        if latest is None:
+            latest = feed.comments.select_related('user').order_by('-created_at', '-id')[:COMMENT_PREVIEW_SIZE]
+        return CommentSerializer(reversed(list(latest)), many=True).data
+
+
+# --- Fast Read Path for the Feed Listing ---
+
+class FeedListFastSerializer:
+    """
+    Read-only stand-in for FeedListSerializer(many=True) on listing pages.
+    Builds plain dicts from the .values() rows of FeedRepository.get_*_rows and
+    get_listing_children instead of running nested field objects per row;
+    the rendered JSON is identical to FeedListSerializer's.
+    """
+    # Reuse DRF's datetime field and the model's storage so dates and URLs format exactly as before
+    _datetime = serializers.DateTimeField()
+    _image_storage = FeedImage._meta.get_field('image').storage
+
+    def __init__(self, feed_rows, image_rows, comment_rows):
+        self.feed_rows = feed_rows
+        self.image_rows = image_rows
+        self.comment_rows = comment_rows
+
+    def _image_url(self, name):
+        return self._image_storage.url(name) if name else None
+
+    @property
+    def data(self):
+        image_url = self._image_url
+        images = {}
+        for row in self.image_rows:
+            images.setdefault(row['feed_id'], []).append({
+                'id': row['id'],
+                'image': image_url(row['image']),
+                'order': row['order'],
+                'width': row['width'],
+                'height': row['height'],
+                'thumbnail': image_url(row['thumbnail']),
+                'medium': image_url(row['medium']),
+                'webp': image_url(row['webp']),
+            })
+
+        datetime_repr = self._datetime.to_representation
+        comments = {}
+        for row in self.comment_rows:
+            comments.setdefault(row['feed_id'], []).append({
+                'id': row['id'],
+                'user': {'id': row['user_id'], 'username': row['user__username']},
+                'text_content': row['text_content'],
+                'created_at': datetime_repr(row['created_at']),
+            })
+
+        return [
+            {
+                'id': row['id'],
+                'user': {'id': row['user_id'], 'username': row['user__username']},
+                'text_content': row['text_content'],
+                'images': images.get(row['id'], []),
+                'comments': comments.get(row['id'], []),
+                'comment_count': row['comment_count'],
+                'created_at': datetime_repr(row['created_at']),
+            }
+            for row in self.feed_rows
+        ]
 
 
 # --- Feed Creation Serializer (Write) ---
@@ -140,20 +212,88 @@ class FeedCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("A feed can only have up to 4 images.")
         return value
 
-    def create(self, validated_data):
-        """Create a Feed and its associated FeedImage entries."""
-        images = validated_data.pop('images', [])
-        request = self.context.get('request')
-        user = request.user if request else None
 
-        # Create Feed
-        feed = Feed.objects.create(user=user, **validated_data)
+# --- Chunked Upload Serializers ---
+
+class UploadStartSerializer(serializers.Serializer):
+    """Opens a resumable upload: the client declares the file name and total size up front."""
+    filename = serializers.CharField(max_length=255)
+    total_size = serializers.IntegerField(min_value=1)
+
+    def validate_total_size(self, value):
+        if value > settings.FEED_UPLOAD_MAX_BYTES:
+            raise serializers.ValidationError(f"Uploads are limited to {settings.FEED_UPLOAD_MAX_BYTES} bytes.")
+        return value
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    complete = serializers.BooleanField(source='is_complete', read_only=True)
+    max_chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ('id', 'filename', 'total_size', 'received_size', 'complete', 'width', 'height', 'max_chunk_size')
+        read_only_fields = fields
+
+    def get_max_chunk_size(self, session):
+        return settings.FEED_UPLOAD_MAX_CHUNK_BYTES
+
+
+class UploadFinalizeSerializer(serializers.Serializer):
+    """Creates a feed from up to 4 finished uploads."""
+    text_content = serializers.CharField(required=False, allow_blank=True, default='')
+    upload_ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+
+    def validate_upload_ids(self, value):
+        if len(value) > 4:
+            raise serializers.ValidationError("A feed can only have up to 4 images.")
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("Each upload can only be attached once.")
+        return value
+
+
+# --- Archived Feeds (read-only, for moderation) ---
+
+class ArchivedFeedImageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArchivedFeedImage
+        fields = ('id', 'image', 'order', 'width', 'height', 'thumbnail', 'medium', 'webp')
+
+
+class ArchivedCommentSerializer(serializers.ModelSerializer):
+    user = UserSerializer(read_only=True)
+
+    class Meta:
+        model = ArchivedComment
+        fields = ('id', 'user', 'text_content', 'created_at')
+
+
+class ArchivedFeedReportSerializer(serializers.ModelSerializer):
+    user = UserSerializer(read_only=True)
+
+    class Meta:
+        model = ArchivedFeedReport
+        fields = ('id', 'user', 'reason', 'created_at')
+
+
+class ArchivedFeedSerializer(serializers.ModelSerializer):
+    user = UserSerializer(read_only=True)
+
+    class Meta:
+        model = ArchivedFeed
+        fields = ('id', 'user', 'text_content', 'created_at', 'is_active', 'report_count',
+                  'comment_count', 'image_count', 'archived_at')
+        read_only_fields = fields
+
 
-        # Create FeedImage entries
-        for idx, image in enumerate(images):
-            FeedImage.objects.create(feed=feed, image=image, order=idx)
+class ArchivedFeedDetailSerializer(ArchivedFeedSerializer):
+    images = ArchivedFeedImageSerializer(many=True, read_only=True)
+    comments = ArchivedCommentSerializer(many=True, read_only=True)
+    reports = ArchivedFeedReportSerializer(many=True, read_only=True)
 
-        return feed
+    class Meta(ArchivedFeedSerializer.Meta):
+        fields = ArchivedFeedSerializer.Meta.fields + ('images', 'comments', 'reports')
+        read_only_fields = fields
 
 
 # --- User Authentication Serializers ---
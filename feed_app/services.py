@@ -1,17 +1,39 @@
-from .repositories import FeedRepository, CommentRepository
+import hashlib
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.cache import cache
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from .db_router import primary_reads
+from .models import FeedImage
+from .repositories import (
+    ArchiveRepository, CommentRepository, FeedRepository, ImageBlobRepository, UploadSessionRepository,
+)
+from .serializers import CommentSerializer, FeedListFastSerializer
+from .utils import events, local_cache, metrics, single_flight, timeline
+from .utils.cache_keys import FEED_LIST_NAMESPACE, aversioned_keys, bump_generation, versioned_keys
+from .utils.image_variants import schedule_image_variants
+from .utils.uploads import PartFile, discard_part, part_path, probe_image_header, write_chunk
 from .utils.loggers import logger 
+from .utils.pagination import decode_cursor, decode_rank_cursor, encode_cursor, encode_rank_cursor
 
 REPORT_THRESHOLD = 3 
+FEED_ENTITY_CACHE_TTL = 300  # seconds; comments, reports and image variants drop their feed's entry early
+FEED_ENTITY_STALE_GRACE = 60  # seconds an expired entry is still served while one worker rebuilds it
+SEARCH_QUERY_MAX_LENGTH = 200
+# Present for DATABASE_REPLICA_PIN_SECONDS after a change to one feed (RECENT_FEED_WRITE_KEY) or to any number
+# of them at once (RECENT_WRITE_KEY): rebuilds of those entries read the primary, everything else the replica
+RECENT_WRITE_KEY = 'feeds:recent_write'
+RECENT_FEED_WRITE_KEY = 'feeds:recent_write:{}'
 
 class FeedService:
     """Handles business logic for Feed creation, listing, and reporting."""
 
     @staticmethod
     def _invalidate_feed_cache():
-        """Helper to clear all feed list caches when data changes."""
-        keys = cache.keys('feeds_list*')
-        cache.delete_many(keys)
+        """Helper to retire all feed list caches when data changes (O(1), no key scan)."""
+        bump_generation(FEED_LIST_NAMESPACE)
+        FeedService._listing_changed()
 
     # @staticmethod
     # def create_feed(user, text_content, image_urls):
@@ -26,30 +48,294 @@ class FeedService:
     def create_feed(user, text_content, images=None):
         """
         Creates a feed post along with uploaded images.
-        `images` should be a list of uploaded files from request.FILES.
+        `images` should be a list of uploaded files from request.FILES (max 4 are kept).
+        Raises ValueError if an image was garbage-collected while being stored (see ImageBlobRepository.register).
         """
-        from feed_app.models import Feed, FeedImage  # import models if needed
+        return FeedService.create_feed_from_blobs(user, text_content, FeedService._store_uploads(images or []))
 
-        try:
-            # Create main feed
-            feed = Feed.objects.create(user=user, text_content=text_content)
-
-            # Save uploaded images
-            if images:
-                for idx, img in enumerate(images[:4]):  # max 4 images
-                    FeedImage.objects.create(feed=feed, image=img, order=idx)
+    @staticmethod
+    def _store_uploads(images):
+        """Writes uploads to blob storage (deduplicated) before any transaction opens; returns stored_images tuples."""
+        storage = FeedImage._meta.get_field('image').storage
+        stored_images = []
+        for upload in images[:4]:
+            # Image validation (DRF/Django ImageField) leaves the opened Pillow image on the upload
+            header = getattr(upload, 'image', None)
+            width, height = header.size if header else (None, None)
+            stored_images.append((storage.save(upload.name, upload), width, height))
+        return stored_images
 
-            FeedService._invalidate_feed_cache()
+    @staticmethod
+    def create_feed_from_blobs(user, text_content, stored_images, upload_ids=()):
+        """
+        The one feed creation pipeline, shared by the API, upload finalize and internal callers.
+        stored_images: (blob_name, width, height) for files already in blob storage.
+        upload_ids: upload sessions consumed by the post, deleted in the same transaction.
+        The transaction costs a fixed number of queries however many images there are
+        (blob refs: 1 UPDATE, feed: 1 INSERT, images: 1 bulk INSERT). Cache invalidation and
+        variant rendering run on commit, so readers never see a half-created post.
+        Call it outside any transaction: register() has to commit on its own.
+        """
+        blob_names = [blob_name for blob_name, _, _ in stored_images]
+        try:
+            ImageBlobRepository.register(blob_names)
+            with transaction.atomic():
+                ImageBlobRepository.acquire_many(blob_names)
+                feed, feed_images = FeedRepository.create_feed(user, text_content, stored_images)
+                if upload_ids:
+                    UploadSessionRepository.delete_sessions(upload_ids)
+                # Only the new id enters the timeline; cached pages of other feeds stay valid
+                transaction.on_commit(lambda: FeedService._on_feed_created(feed))
+                schedule_image_variants([feed_image.id for feed_image in feed_images])
             return feed
         except Exception as e:
             logger.error(f"Error creating feed for user {user.id}", exc_info=True)
             raise e
 
+    @staticmethod
+    def _on_feed_created(feed):
+        """Runs once the creating transaction commits: timeline insert, then a push to live clients."""
+        timeline.add(feed.id, feed.created_at)
+        FeedService._listing_changed([feed.id])
+        try:
+            # Clients get the rendered entry pushed, so none of them re-fetch the list (this warms its cache entry too)
+            entries = FeedService._hydrate([feed.id])
+            if entries:
+                events.publish('feed_created', entries[0])
+        except Exception:
+            logger.error(f"Could not announce feed {feed.id}", exc_info=True)
+
+    @staticmethod
+    def _on_feed_removed(feed_id):
+        timeline.remove(feed_id)
+        FeedService._invalidate_feed_entries([feed_id])
+        events.publish('feed_removed', {'id': feed_id})
+
+    @staticmethod
+    def _listing_changed(feed_ids=None):
+        """
+        Runs after every change a list page could show: empties the in-process page caches, and for the
+        replication lag window has rebuilds of the changed feeds' entries (all of them when feed_ids is None)
+        read the primary, so a lagging replica can't cache a stale entry.
+        """
+        local_cache.invalidate()
+        if feed_ids is None:
+            cache.set(RECENT_WRITE_KEY, 1, settings.DATABASE_REPLICA_PIN_SECONDS)
+        else:
+            cache.set_many({RECENT_FEED_WRITE_KEY.format(feed_id): 1 for feed_id in feed_ids}, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+    @staticmethod
+    def _split_recently_written(feed_ids, found):
+        """(ids changed within the replication lag window, the rest), given the cache hits among _write_keys()."""
+        if RECENT_WRITE_KEY in found:
+            return list(feed_ids), []
+        recent = [feed_id for feed_id in feed_ids if RECENT_FEED_WRITE_KEY.format(feed_id) in found]
+        return recent, [feed_id for feed_id in feed_ids if RECENT_FEED_WRITE_KEY.format(feed_id) not in found]
+
+    @staticmethod
+    def _write_keys(feed_ids):
+        return [RECENT_WRITE_KEY, *(RECENT_FEED_WRITE_KEY.format(feed_id) for feed_id in feed_ids)]
+
+    @staticmethod
+    def _invalidate_feed_entries(feed_ids):
+        """Drops the cached listing entries of these feeds only; the timeline and every other feed stay warm."""
+        cache.delete_many(versioned_keys(FEED_LIST_NAMESPACE, [f'entry_{feed_id}' for feed_id in feed_ids]))
+        FeedService._listing_changed(feed_ids)
+
+    @staticmethod
+    def _render_page(data):
+        """Returns (body, etag) for a feed list page, where body is the rendered JSON bytes."""
+        body = JSONRenderer().render(data)
+        return body, '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    @staticmethod
+    def _serialize_feed_rows(feed_rows):
+        image_rows, comment_rows = FeedRepository.get_listing_children(feed_rows)
+        return FeedListFastSerializer(feed_rows, image_rows, comment_rows).data
+
+    @staticmethod
+    def _build_entities(feed_ids):
+        recent, settled = FeedService._split_recently_written(feed_ids, cache.get_many(FeedService._write_keys(feed_ids)))
+        entities = {}
+        for ids, on_primary in ((recent, True), (settled, False)):
+            if ids:
+                with primary_reads(on_primary):
+                    feed_rows = FeedRepository.get_feed_rows_by_ids(ids)
+                    entities.update((entity['id'], entity) for entity in FeedService._serialize_feed_rows(feed_rows))
+        return entities
+
+    @staticmethod
+    def _hydrate(feed_ids):
+        """
+        Listing entries for feed_ids, in order: one MGET against the per-feed cache, then the DB
+        for the misses only, rebuilt once across workers (utils.single_flight). Feeds deactivated
+        in the meantime are left out.
+        """
+        keys_by_id = dict(zip(feed_ids, versioned_keys(FEED_LIST_NAMESPACE, [f'entry_{feed_id}' for feed_id in feed_ids])))
+        entities = single_flight.get_many(
+            keys_by_id, FeedService._build_entities, FEED_ENTITY_CACHE_TTL, FEED_ENTITY_STALE_GRACE, 'feed_entity'
+        )
+        return [entities[feed_id] for feed_id in feed_ids if feed_id in entities]
+
+    @staticmethod
+    def _page_entries(after, limit, offset=0):
+        """(id, created_at) entries of a page from the Redis timeline, or the DB when it can't answer."""
+        entries = timeline.page(after, limit, offset, loader=FeedRepository.get_timeline_entries)
+        metrics.record_cache('timeline', int(entries is not None), int(entries is None))
+        if entries is None:
+            entries = FeedRepository.get_feed_entries_page(after, limit, offset)
+        return entries
+
+    @staticmethod
+    def get_feed_list_payload(offset, limit):
+        """Offset page of the feed list as (json_bytes, etag). Raises ValueError for a negative offset or limit."""
+        if offset < 0 or limit < 0:
+            raise ValueError("Invalid pagination parameters.")
+
+        # Rendered pages are served from process memory first (utils.local_cache), then Redis
+        page, epoch = local_cache.lookup(('offset', offset, limit))
+        metrics.record_cache('local_page', int(page is not None), int(page is None))
+        if page is None:
+            entries = FeedService._page_entries(None, limit, offset)
+            page = FeedService._render_page(FeedService._hydrate([feed_id for feed_id, _ in entries]))
+            local_cache.store(('offset', offset, limit), page, epoch)
+        return page
+
+    @staticmethod
+    def get_feed_page_payload(cursor, limit):
+        """Cursor page of the feed list as (json_bytes, etag). Raises ValueError for a malformed cursor."""
+        page, epoch = local_cache.lookup(('cursor', cursor, limit))
+        metrics.record_cache('local_page', int(page is not None), int(page is None))
+        if page is None:
+            page = FeedService._build_feed_page(cursor, limit)
+            local_cache.store(('cursor', cursor, limit), page, epoch)
+        return page
+
+    @staticmethod
+    def _build_feed_page(cursor, limit):
+        after = decode_cursor(cursor) if cursor else None
+        # One extra entry tells whether another page exists
+        entries = FeedService._page_entries(after, limit + 1)
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = encode_cursor(entries[-1][1], entries[-1][0])
+
+        results = FeedService._hydrate([feed_id for feed_id, _ in entries])
+        return FeedService._render_page({'next': next_cursor, 'results': results})
+
+    @staticmethod
+    def search_feeds_payload(query, cursor, limit):
+        """
+        Ranked full-text search over active feeds as (json_bytes, etag) with a {"next", "results"} body.
+        Raises ValueError for an empty or over-long query or a malformed cursor.
+        """
+        query = query.strip()
+        if not query or len(query) > SEARCH_QUERY_MAX_LENGTH:
+            raise ValueError("Invalid search query.")
+
+        after = decode_rank_cursor(cursor) if cursor else None
+        entries = FeedRepository.search_feed_entries(query, after, limit + 1)
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = encode_rank_cursor(entries[-1][1], entries[-1][0])
+
+        # Matches are ranked in the DB; their bodies come from the same per-feed cache as the list
+        results = FeedService._hydrate([feed_id for feed_id, _ in entries])
+        return FeedService._render_page({'next': next_cursor, 'results': results})
+
+    # --- Async variants (ASGI views): async ORM and the async cache API, no thread per request ---
+
+    @staticmethod
+    async def _aserialize_feed_rows(feed_rows):
+        image_rows, comment_rows = await FeedRepository.aget_listing_children(feed_rows)
+        return FeedListFastSerializer(feed_rows, image_rows, comment_rows).data
+
+    @staticmethod
+    async def _abuild_entities(feed_ids):
+        recent, settled = FeedService._split_recently_written(
+            feed_ids, await cache.aget_many(FeedService._write_keys(feed_ids))
+        )
+        entities = {}
+        for ids, on_primary in ((recent, True), (settled, False)):
+            if ids:
+                with primary_reads(on_primary):
+                    feed_rows = await FeedRepository.aget_feed_rows_by_ids(ids)
+                    entities.update((entity['id'], entity) for entity in await FeedService._aserialize_feed_rows(feed_rows))
+        return entities
+
+    @staticmethod
+    async def _ahydrate(feed_ids):
+        keys = await aversioned_keys(FEED_LIST_NAMESPACE, [f'entry_{feed_id}' for feed_id in feed_ids])
+        entities = await single_flight.aget_many(
+            dict(zip(feed_ids, keys)), FeedService._abuild_entities, FEED_ENTITY_CACHE_TTL, FEED_ENTITY_STALE_GRACE,
+            'feed_entity',
+        )
+        return [entities[feed_id] for feed_id in feed_ids if feed_id in entities]
+
+    @staticmethod
+    async def _apage_entries(after, limit, offset=0):
+        # django-redis hands out a sync client, so the timeline read hops to a thread
+        entries = await sync_to_async(timeline.page)(after, limit, offset, loader=FeedRepository.get_timeline_entries)
+        metrics.record_cache('timeline', int(entries is not None), int(entries is None))
+        if entries is None:
+            entries = await FeedRepository.aget_feed_entries_page(after, limit, offset)
+        return entries
+
+    @staticmethod
+    async def aget_feed_list_payload(offset, limit):
+        if offset < 0 or limit < 0:
+            raise ValueError("Invalid pagination parameters.")
+
+        page, epoch = local_cache.lookup(('offset', offset, limit))
+        metrics.record_cache('local_page', int(page is not None), int(page is None))
+        if page is None:
+            entries = await FeedService._apage_entries(None, limit, offset)
+            page = FeedService._render_page(await FeedService._ahydrate([feed_id for feed_id, _ in entries]))
+            local_cache.store(('offset', offset, limit), page, epoch)
+        return page
+
+    @staticmethod
+    async def aget_feed_page_payload(cursor, limit):
+        page, epoch = local_cache.lookup(('cursor', cursor, limit))
+        metrics.record_cache('local_page', int(page is not None), int(page is None))
+        if page is None:
+            page = await FeedService._abuild_feed_page(cursor, limit)
+            local_cache.store(('cursor', cursor, limit), page, epoch)
+        return page
+
+    @staticmethod
+    async def _abuild_feed_page(cursor, limit):
+        after = decode_cursor(cursor) if cursor else None
+        entries = await FeedService._apage_entries(after, limit + 1)
+        next_cursor = None
+        if len(entries) > limit:
+            entries = entries[:limit]
+            next_cursor = encode_cursor(entries[-1][1], entries[-1][0])
 
+        results = await FeedService._ahydrate([feed_id for feed_id, _ in entries])
+        return FeedService._render_page({'next': next_cursor, 'results': results})
 
     @staticmethod
-    def get_feeds(offset, limit):
-        return FeedRepository.get_latest_feeds(offset, limit)
+    async def ahandle_report(feed_id, reporting_user):
+        feed = await FeedRepository.aget_feed_by_id(feed_id)
+        if not feed or not feed.is_active:
+            return None
+
+        # The report is a transaction, which the async ORM cannot run; it is two short statements
+        result = await sync_to_async(FeedRepository.record_report)(feed.id, reporting_user, REPORT_THRESHOLD)
+        if result is None:
+            feed.is_active = False
+            return feed
+
+        feed.report_count, feed.is_active, deactivated = result
+        if deactivated:
+            # Redis timeline and pub/sub only have sync clients here
+            await sync_to_async(FeedService._on_feed_removed)(feed.id)
+            logger.info(f"Feed {feed.id} automatically deactivated due to {REPORT_THRESHOLD} reports.")
+
+        return feed
 
     @staticmethod
     def handle_report(feed_id, reporting_user):
@@ -58,22 +344,174 @@ class FeedService:
         if not feed or not feed.is_active:
             return None 
 
-        new_count = FeedRepository.create_report_and_get_count(feed, reporting_user)
+        result = FeedRepository.record_report(feed.id, reporting_user, REPORT_THRESHOLD)
+        if result is None:
+            # A concurrent report crossed the threshold between the lookup and the update
+            feed.is_active = False
+            return feed
 
-        if new_count >= REPORT_THRESHOLD and feed.is_active:
+        feed.report_count, feed.is_active, deactivated = result
+        if deactivated:
             # If 3 unique users report a feed, it should disappear
-            feed.is_active = False 
-            feed.save(update_fields=['is_active'])
-            FeedService._invalidate_feed_cache()
+            FeedService._on_feed_removed(feed.id)
             logger.info(f"Feed {feed.id} automatically deactivated due to {REPORT_THRESHOLD} reports.")
 
         return feed
 
 class CommentService:
+    @staticmethod
+    def _on_comment_created(comment):
+        # Only this feed's cached entry goes stale; open pages get the comment pushed
+        FeedService._invalidate_feed_entries([comment.feed_id])
+        events.publish('comment_created', {'feed_id': comment.feed_id, 'comment': CommentSerializer(comment).data})
+
     @staticmethod
     def create_comment(feed_id, user, text_content):
         feed = FeedRepository.get_feed_by_id(feed_id)
         if not feed or not feed.is_active:
             raise ValueError("Feed not found or is inactive.")
             
-        return CommentRepository.create_comment(feed, user, text_content)
\ No newline at end of file
+        comment = CommentRepository.create_comment(feed, user, text_content)
+        CommentService._on_comment_created(comment)
+        return comment
+
+    @staticmethod
+    def get_comments_page(feed_id, cursor, limit):
+        """Returns (comments, next_cursor), or None if the feed is missing or inactive."""
+        feed = FeedRepository.get_feed_by_id(feed_id)
+        if not feed or not feed.is_active:
+            return None
+
+        return CommentRepository.get_comments_page(feed, cursor, limit)
+
+    @staticmethod
+    async def acreate_comment(feed_id, user, text_content):
+        feed = await FeedRepository.aget_feed_by_id(feed_id)
+        if not feed or not feed.is_active:
+            raise ValueError("Feed not found or is inactive.")
+
+        comment = await CommentRepository.acreate_comment(feed, user, text_content)
+        await sync_to_async(CommentService._on_comment_created)(comment)
+        return comment
+
+    @staticmethod
+    async def aget_comments_page(feed_id, cursor, limit):
+        feed = await FeedRepository.aget_feed_by_id(feed_id)
+        if not feed or not feed.is_active:
+            return None
+
+        return await CommentRepository.aget_comments_page(feed, cursor, limit)
+
+
+class UploadService:
+    """Resumable chunked image uploads: start a session, stream chunks, finalize into a Feed."""
+
+    @staticmethod
+    def start_upload(user, filename, total_size):
+        return UploadSessionRepository.create_session(user, filename, total_size)
+
+    @staticmethod
+    def get_upload(session_id, user):
+        return UploadSessionRepository.get_session(session_id, user)
+
+    @staticmethod
+    def append_chunk(session, offset, stream):
+        """
+        Streams one chunk to disk at `offset`. Returns the updated session, or None if `offset` is not
+        where the upload currently stands (the client should re-read the session and resume from there).
+        Raises ValueError for an oversized chunk, or (discarding the session) for a non-image upload.
+        """
+        if offset != session.received_size:
+            return None
+
+        # The row lock is held across the write: a concurrent retry of the same chunk waits, then finds
+        # the offset moved on, instead of writing over bytes that are already counted
+        with transaction.atomic():
+            if UploadSessionRepository.lock_received_size(session) != offset:
+                return None
+            max_bytes = min(settings.FEED_UPLOAD_MAX_CHUNK_BYTES, session.total_size - offset)
+            written = write_chunk(session.id, offset, stream, max_bytes)
+            if written is None:
+                raise ValueError("Chunk is larger than the chunk limit or the declared upload size.")
+            UploadSessionRepository.advance(session, offset, written)
+        session.received_size = offset + written
+
+        # Validate format and pixel size from the header alone, as early as the bytes allow
+        if not session.image_format:
+            try:
+                header = probe_image_header(session.id, session.received_size, session.received_size == session.total_size)
+            except ValueError:
+                UploadService.abort(session)
+                raise
+            if header:
+                session.image_format, session.width, session.height = header
+                UploadSessionRepository.set_header_info(session, *header)
+
+        return session
+
+    @staticmethod
+    def abort(session):
+        discard_part(session.id)
+        session.delete()
+
+    @staticmethod
+    def finalize(user, text_content, session_ids):
+        """
+        Creates a Feed from finished uploads. The part files are moved into blob storage first,
+        so the transaction itself only inserts rows (see create_feed_from_blobs); the sessions
+        are deleted in that transaction. A retry after a failure reuses files already moved.
+        Raises ValueError if any session is missing or incomplete, or its bytes are gone.
+        """
+        sessions = UploadSessionRepository.get_complete_sessions(user, session_ids)
+        storage = FeedImage._meta.get_field('image').storage
+
+        stored_images = []
+        for session in sessions:
+            if session.blob_name and storage.exists(session.blob_name):
+                blob_name = session.blob_name  # moved by an earlier attempt that failed later on
+            else:
+                try:
+                    part = PartFile(open(part_path(session.id), 'rb'), name=session.filename)
+                except FileNotFoundError:
+                    raise ValueError("An upload's data is no longer available; please upload it again.")
+                with part:
+                    blob_name = storage.save(session.filename, part)
+                UploadSessionRepository.set_blob_name(session, blob_name)
+            stored_images.append((blob_name, session.width, session.height))
+
+        feed = FeedService.create_feed_from_blobs(user, text_content, stored_images, upload_ids=session_ids)
+
+        # Part files whose content was already stored were not moved
+        for session in sessions:
+            discard_part(session.id)
+
+        return feed
+
+
+class ArchiveService:
+    """Keeps the hot feed tables small by moving old and deactivated feeds into cold storage."""
+
+    @staticmethod
+    def archive_batch(created_before=None, batch_size=500):
+        """
+        Archives up to `batch_size` deactivated feeds (and active ones created before `created_before`).
+        Returns how many were moved; 0 means nothing is left to archive.
+        """
+        moved = ArchiveRepository.archive_feeds(ArchiveRepository.get_archivable_feed_ids(created_before, batch_size))
+
+        # Deactivated feeds already left the timeline and the cache when they were removed
+        aged_out = [feed_id for feed_id, was_active in moved if was_active]
+        for feed_id in aged_out:
+            timeline.remove(feed_id)
+        if aged_out:
+            FeedService._invalidate_feed_entries(aged_out)
+        return len(moved)
+
+    @staticmethod
+    def get_archived_feeds_page(cursor, limit):
+        """Returns (feeds, next_cursor); raises ValueError for a malformed cursor."""
+        return ArchiveRepository.get_archived_feeds_page(cursor, limit)
+
+    @staticmethod
+    def get_archived_feed(feed_id):
+        return ArchiveRepository.get_archived_feed(feed_id)
@@ -0,0 +1,75 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, pre_delete
+from django.dispatch import receiver
+
+from .models import Comment, Feed, FeedImage
+from .repositories import CommentRepository, FeedRepository, ImageBlobRepository
+from .services import FeedService
+
+_pending = threading.local()  # alias -> (feed ids, on_commit callback) of the transaction in progress
+
+
+def _parent_is_going(origin):
+    """True when a row is deleted as a cascade from its feed or author: the feed's counters and entry go too."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, (Feed, User))
+
+
+def _invalidate_feed_entries(feed_ids, using):
+    """
+    Drops these feeds' cached listing entries once the delete commits. Every row deleted in one
+    transaction shares a single callback, so a bulk delete does not invalidate once per row.
+    """
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        FeedService._invalidate_feed_entries(feed_ids)
+        return
+    pending = getattr(_pending, using, None)
+    # A rollback discards the callback along with the transaction; start a new set rather than feed a dead one
+    if pending is None or not any(entry[1] is pending[1] for entry in connection.run_on_commit):
+        collected = set()
+
+        def flush():
+            if getattr(_pending, using, None) is pending_entry:
+                delattr(_pending, using)
+            FeedService._invalidate_feed_entries(sorted(collected))
+
+        pending = pending_entry = (collected, flush)
+        setattr(_pending, using, pending)
+        transaction.on_commit(flush, using=using)
+    pending[0].update(feed_ids)
+
+
+@receiver(post_delete, sender=FeedImage)
+def release_image_blob(sender, instance, using, origin=None, **kwargs):
+    """
+    Keeps ImageBlob.ref_count and Feed.image_count in step when feed images go away. In a cascade from
+    the feed or its author only the blob reference is dropped: the feed row and its entry are going too.
+    """
+    if instance.blob_id:
+        ImageBlobRepository.release(instance.blob_id)
+    if _parent_is_going(origin):
+        return
+    FeedRepository.decrement_image_count(instance.feed_id)
+    _invalidate_feed_entries([instance.feed_id], using)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, using, origin=None, **kwargs):
+    """Keeps Feed.comment_count in step when comments are deleted; cascades are settled by discount_user_comments."""
+    if _parent_is_going(origin):
+        return
+    CommentRepository.decrement_comment_count(instance.feed_id)
+    _invalidate_feed_entries([instance.feed_id], using)
+
+
+@receiver(pre_delete, sender=User)
+def discount_user_comments(sender, instance, using, **kwargs):
+    """A deleted user's comments on other users' feeds leave their counters in one UPDATE, not one per comment."""
+    feed_ids = CommentRepository.discount_user_comments(instance)
+    if feed_ids:
+        _invalidate_feed_entries(feed_ids, using)
@@ -1,3 +1,864 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import close_old_connections, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from .middleware import REPLICA_PIN_COOKIE
+from .models import (
+    ArchivedComment, ArchivedFeed, ArchivedFeedImage, ArchivedFeedReport, Comment, Feed, FeedImage, FeedReport, ImageBlob,
+    UploadSession,
+)
+from .repositories import (
+    ArchiveRepository, CommentRepository, FeedRepository, _archivable_querysets, _comments_page_queryset, _feed_entries,
+    _listing_rows,
+)
+from .serializers import FeedListFastSerializer, FeedListSerializer
+from .services import REPORT_THRESHOLD, SEARCH_QUERY_MAX_LENGTH, ArchiveService, FeedService, UploadService
+from .utils import local_cache, metrics, single_flight, throttling
+from .utils.image_variants import generate_image_variants
+from .utils.uploads import part_path
+
+
+def _clear_caches():
+    """Empties Redis (or LocMem) and this process's rendered-page cache, which cache.clear() does not reach."""
+    cache.clear()
+    local_cache.invalidate()
+
+
+def _run_concurrently(target, threads):
+    """Starts `threads` calls of target() at the same moment; returns (results, errors)."""
+    barrier = threading.Barrier(threads)
+    results, errors = [], []
+
+    def run():
+        try:
+            barrier.wait()
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close_old_connections()
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results, errors
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentReportTests(TransactionTestCase):
+    """Reports arriving at the same moment must each be counted once, and deactivate the feed once."""
+
+    databases = {'default', 'replica'}
+
+    THREADS = 12
+
+    def setUp(self):
+        author = User.objects.create_user('author', password='x')
+        self.feed = Feed.objects.create(user=author, text_content='storm')
+
+    def _hammer(self, reporters):
+        barrier = threading.Barrier(len(reporters))
+        results, errors = [], []
+
+        def report(user):
+            try:
+                barrier.wait()
+                results.append(FeedService.handle_report(self.feed.id, user))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                close_old_connections()
+
+        threads = [threading.Thread(target=report, args=(user,)) for user in reporters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        return results
+
+    def test_report_storm_deactivates_exactly_once(self):
+        reporters = [User.objects.create_user(f'reporter{i}', password='x') for i in range(self.THREADS)]
+        results = self._hammer(reporters)
+
+        self.feed.refresh_from_db()
+        self.assertFalse(self.feed.is_active)
+        self.assertEqual(self.feed.report_count, REPORT_THRESHOLD)
+        deactivating = [feed for feed in results if feed and feed.report_count == REPORT_THRESHOLD and not feed.is_active]
+        self.assertEqual(len(deactivating), 1)
+
+    def test_duplicate_reports_below_threshold_are_counted_once(self):
+        reporters = [User.objects.create_user(f'reporter{i}', password='x') for i in range(REPORT_THRESHOLD - 1)]
+        self._hammer(reporters * (self.THREADS // len(reporters)))
+
+        self.feed.refresh_from_db()
+        self.assertTrue(self.feed.is_active)
+        self.assertEqual(self.feed.report_count, REPORT_THRESHOLD - 1)
+        self.assertEqual(FeedReport.objects.filter(feed=self.feed).count(), REPORT_THRESHOLD - 1)
+
+
+class ReportTests(TestCase):
+    """Sequential reports: one count per user, deactivation at the threshold, nothing stored for inactive feeds."""
+
+    def setUp(self):
+        _clear_caches()
+        self.feed = Feed.objects.create(user=User.objects.create_user('author', password='x'), text_content='post')
+        self.reporters = [User.objects.create_user(f'reporter{i}', password='x') for i in range(REPORT_THRESHOLD)]
+
+    def test_reports_count_once_per_user_and_deactivate_at_threshold(self):
+        for reporter in self.reporters[:-1]:
+            for _ in range(2):
+                feed = FeedService.handle_report(self.feed.id, reporter)
+        self.assertEqual((feed.report_count, feed.is_active), (REPORT_THRESHOLD - 1, True))
+
+        feed = FeedService.handle_report(self.feed.id, self.reporters[-1])
+        self.assertEqual((feed.report_count, feed.is_active), (REPORT_THRESHOLD, False))
+        self.feed.refresh_from_db()
+        self.assertEqual((self.feed.report_count, self.feed.is_active), (REPORT_THRESHOLD, False))
+        self.assertEqual(FeedReport.objects.filter(feed=self.feed).count(), REPORT_THRESHOLD)
+        self.assertIsNone(FeedService.handle_report(self.feed.id, User.objects.create_user('late', password='x')))
+
+    def test_report_on_inactive_feed_stores_nothing(self):
+        Feed.objects.filter(id=self.feed.id).update(is_active=False)
+        self.assertIsNone(FeedRepository.record_report(self.feed.id, self.reporters[0], REPORT_THRESHOLD))
+        self.assertFalse(FeedReport.objects.filter(feed=self.feed).exists())
+        self.feed.refresh_from_db()
+        self.assertEqual(self.feed.report_count, 0)
+
+
+class FastSerializerCompatibilityTests(TestCase):
+    """FeedListFastSerializer must render the listing byte for byte like FeedListSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author', password='x')
+        commenter = User.objects.create_user('commenter', password='x')
+        Feed.objects.create(user=author, text_content='plain')
+
+        with_images = Feed.objects.create(user=author, text_content='photos')
+        FeedImage.objects.create(feed=with_images, image='feed_images/a.jpg', order=0, width=640, height=480,
+                                 thumbnail='feed_images/variants/a_thumb.jpg')
+        FeedImage.objects.create(feed=with_images, image='feed_images/b.jpg', order=1)
+
+        with_comments = Feed.objects.create(user=author, text_content='discussed \u00e9\U0001f600 "quoted"')
+        for i in range(5):  # more than the preview holds
+            Comment.objects.create(feed=with_comments, user=commenter, text_content=f'comment {i}')
+
+        Feed.objects.filter(id=with_images.id).update(image_count=2)
+        Feed.objects.filter(id=with_comments.id).update(comment_count=5)
+
+    def test_rendered_bytes_match(self):
+        _clear_caches()
+        feeds = list(Feed.objects.filter(is_active=True).order_by('-created_at', '-id'))
+        expected = JSONRenderer().render(FeedListSerializer(feeds, many=True).data)
+        self.assertEqual(len(feeds), 3)
+
+        # What the listing serves: timeline page, entry cache, FeedListFastSerializer
+        self.client.force_login(feeds[0].user)
+        self.assertEqual(self.client.get('/api/v1/feeds/', {'limit': 10}).content, expected)
+        feed_rows = sorted(FeedRepository.get_feed_rows_by_ids([feed.id for feed in feeds]), key=lambda row: -row['id'])
+        image_rows, comment_rows = FeedRepository.get_listing_children(feed_rows)
+        self.assertEqual(JSONRenderer().render(FeedListFastSerializer(feed_rows, image_rows, comment_rows).data), expected)
+
+
+class CursorPaginationTests(TestCase):
+    """Cursor pages of the feed list and comment threads: every row once, in order, and 400 for a bad cursor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='x')
+        cls.feeds = [Feed.objects.create(user=cls.author, text_content=f'post {i}') for i in range(12)]
+        for i in range(7):
+            CommentRepository.create_comment(cls.feeds[0], cls.author, f'comment {i}')
+
+    def setUp(self):
+        _clear_caches()
+        self.client.force_login(self.author)
+
+    def walk(self, url, limit):
+        seen, params = [], {'cursor': '', 'limit': limit}
+        while True:
+            body = self.client.get(url, params).json()
+            self.assertLessEqual(len(body['results']), limit)
+            seen.extend(row['id'] for row in body['results'])
+            if body['next'] is None:
+                return seen
+            params['cursor'] = body['next']
+
+    def test_pages_cover_every_feed_once_newest_first(self):
+        expected = [feed.id for feed in reversed(self.feeds)]
+        self.assertEqual(self.walk('/api/v1/feeds/', 5), expected)
+        self.assertEqual(self.walk('/api/v1/async/feeds/', 5), expected)
+
+    def test_feed_created_between_pages_does_not_shift_later_pages(self):
+        first = self.client.get('/api/v1/feeds/', {'cursor': '', 'limit': 5}).json()
+        Feed.objects.create(user=self.author, text_content='newer post')
+        rest = self.client.get('/api/v1/feeds/', {'cursor': first['next'], 'limit': 5}).json()
+        self.assertEqual(
+            [feed['id'] for feed in first['results'] + rest['results']], [feed.id for feed in reversed(self.feeds)][:10]
+        )
+
+    def test_comment_pages_cover_the_thread_once_newest_first(self):
+        expected = list(Comment.objects.filter(feed=self.feeds[0]).order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(self.walk(f'/api/v1/feeds/{self.feeds[0].id}/comments/', 3), expected)
+
+    def test_malformed_cursor_is_rejected(self):
+        urls = (
+            '/api/v1/feeds/',
+            '/api/v1/async/feeds/',
+            f'/api/v1/feeds/{self.feeds[0].id}/comments/',
+            f'/api/v1/async/feeds/{self.feeds[0].id}/comments/',
+        )
+        for url in urls:
+            for cursor in ('garbage', 'W10', 'WyJub3QgYSBkYXRlIiwxXQ'):  # not base64 JSON, [], ["not a date",1]
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 400, (url, cursor))
+
+    def test_offset_mode_still_returns_a_plain_list(self):
+        body = self.client.get('/api/v1/feeds/', {'offset': 5, 'limit': 5}).json()
+        self.assertEqual([feed['id'] for feed in body], [feed.id for feed in reversed(self.feeds)][5:10])
+
+
+class TimelineOrderTests(TestCase):
+    """Feeds sharing a created_at page in (-created_at, -id) order, whether the timeline or the DB serves the page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='x')
+        feeds = [Feed.objects.create(user=cls.author, text_content=f'post {i}') for i in range(9)]
+        # Three runs of equal timestamps; the newest timestamp goes to the oldest ids so id order alone is wrong
+        tied = feeds[0].created_at
+        for run, start in enumerate((0, 3, 6)):
+            Feed.objects.filter(id__in=[feed.id for feed in feeds[start:start + 3]]).update(
+                created_at=tied - timedelta(minutes=run)
+            )
+        cls.expected = list(Feed.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        _clear_caches()
+        self.client.force_login(self.author)
+
+    def test_page_entries_break_ties_by_id(self):
+        entries = FeedService._page_entries(None, 20)
+        self.assertEqual([feed_id for feed_id, _ in entries], self.expected)
+        self.assertEqual(entries, FeedRepository.get_feed_entries_page(None, 20, 0))
+        self.assertEqual([feed_id for feed_id, _ in FeedService._page_entries(None, 4, 2)], self.expected[2:6])
+
+    def test_cursor_inside_a_tie_neither_repeats_nor_skips(self):
+        for limit in (1, 2, 4):
+            seen, params = [], {'cursor': '', 'limit': limit}
+            while True:
+                body = self.client.get('/api/v1/feeds/', params).json()
+                seen.extend(feed['id'] for feed in body['results'])
+                if body['next'] is None:
+                    break
+                params['cursor'] = body['next']
+            self.assertEqual(seen, self.expected, limit)
+
+
+class ListingETagTests(TestCase):
+    """Listing responses carry an ETag; a client holding the current one gets an empty 304, a stale one the new page."""
+
+    URLS = (
+        ('/api/v1/feeds/', {'cursor': ''}),
+        ('/api/v1/feeds/', {'offset': 0}),
+        ('/api/v1/async/feeds/', {'cursor': ''}),
+        ('/api/v1/feeds/search/', {'q': 'kitten'}),
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='x')
+        cls.feed = Feed.objects.create(user=cls.author, text_content='kitten')
+
+    def setUp(self):
+        _clear_caches()
+        self.client.force_login(self.author)
+
+    def test_matching_etag_gets_empty_304(self):
+        for url, params in self.URLS:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertTrue(response['ETag'], url)
+
+            repeat = self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(repeat.status_code, 304, url)
+            self.assertEqual(repeat.content, b'', url)
+            self.assertEqual(repeat['ETag'], response['ETag'], url)
+
+            self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH='"stale"').status_code, 200, url)
+
+    def test_etag_changes_after_a_write(self):
+        etags = {(url, str(params)): self.client.get(url, params)['ETag'] for url, params in self.URLS}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/v1/feeds/{self.feed.id}/comments/', {'text_content': 'kitten comment'})
+        self.assertEqual(response.status_code, 201)
+
+        for url, params in self.URLS:
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etags[url, str(params)])
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etags[url, str(params)], url)
+
+
+class FeedSearchTests(TestCase):
+    """GET /feeds/search/: query validation, active feeds only, and rank-cursor pages that add up to every match."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='x')
+        # Repeating the word gives the matches different ranks where the backend ranks them (Postgres)
+        cls.matches = [
+            Feed.objects.create(user=cls.author, text_content=' '.join(['kitten'] * (i % 3 + 1) + [f'post {i}']))
+            for i in range(23)
+        ]
+        hidden = [Feed.objects.create(user=cls.author, text_content=f'kitten hidden {i}') for i in range(4)]
+        Feed.objects.filter(id__in=[feed.id for feed in hidden]).update(is_active=False)
+        for i in range(5):
+            Feed.objects.create(user=cls.author, text_content=f'puppy {i}')
+
+    def setUp(self):
+        _clear_caches()
+        self.client.force_login(self.author)
+
+    def search(self, **params):
+        return self.client.get('/api/v1/feeds/search/', params)
+
+    def test_query_is_validated(self):
+        for q in ('', '   ', 'k' * (SEARCH_QUERY_MAX_LENGTH + 1)):
+            self.assertEqual(self.search(q=q).status_code, 400, q)
+        self.assertEqual(self.client.get('/api/v1/feeds/search/').status_code, 400)
+        self.assertEqual(self.search(q='k' * SEARCH_QUERY_MAX_LENGTH).status_code, 200)
+
+    def test_inactive_feeds_are_excluded(self):
+        response = self.search(q='hidden')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'next': None, 'results': []})
+
+    def test_rank_cursor_pages_cover_every_match_once(self):
+        seen, params, pages = [], {'q': 'kitten', 'limit': 4}, 0
+        while True:
+            body = self.search(**params).json()
+            self.assertLessEqual(len(body['results']), 4)
+            seen.extend(feed['id'] for feed in body['results'])
+            pages += 1
+            if body['next'] is None:
+                break
+            params['cursor'] = body['next']
+        self.assertEqual(pages, 6)
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(sorted(seen), sorted(feed.id for feed in self.matches))
+
+
+class ChildDeleteCounterTests(TestCase):
+    """Deleting comments and images keeps the feed's counters and its cached listing entry current."""
+
+    def setUp(self):
+        _clear_caches()
+        self.author = User.objects.create_user('author', password='x')
+        self.client.force_login(self.author)
+        self.feed = Feed.objects.create(user=self.author, text_content='post')
+        self.comments = [CommentRepository.create_comment(self.feed, self.author, f'comment {i}') for i in range(3)]
+        self.blob = ImageBlob.objects.create(name='feed_images/blobs/ab/ab.jpg', digest='ab', size=1, ref_count=2)
+        self.images = [
+            FeedImage.objects.create(feed=self.feed, image=self.blob.name, blob=self.blob, order=i) for i in range(2)
+        ]
+        Feed.objects.filter(id=self.feed.id).update(image_count=2)
+
+    def listed_feed(self):
+        return next(feed for feed in self.client.get('/api/v1/feeds/', {'cursor': ''}).json()['results'] if feed['id'] == self.feed.id)
+
+    def test_deletes_update_counters_and_cached_entry(self):
+        self.assertEqual(len(self.listed_feed()['comments']), 3)  # caches the entry
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.comments[0].delete()
+            self.images[0].delete()
+        self.assertEqual(len(callbacks), 1)  # one invalidation per transaction, not per row
+        self.feed.refresh_from_db()
+        self.blob.refresh_from_db()
+        self.assertEqual((self.feed.comment_count, self.feed.image_count, self.blob.ref_count), (2, 1, 1))
+        listed = self.listed_feed()
+        self.assertEqual((listed['comment_count'], len(listed['images'])), (2, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.filter(feed=self.feed).delete()
+            FeedImage.objects.filter(feed=self.feed).delete()
+        self.feed.refresh_from_db()
+        self.assertEqual((self.feed.comment_count, self.feed.image_count), (0, 0))
+        listed = self.listed_feed()
+        self.assertEqual((listed['comment_count'], listed['comments'], listed['images']), (0, [], []))
+
+    def test_feed_delete_skips_per_child_bookkeeping(self):
+        for i in range(47):
+            CommentRepository.create_comment(self.feed, self.author, f'more {i}')
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks() as callbacks:
+            self.feed.delete()
+        self.assertEqual(callbacks, [])
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE "feed_app_feed"')])
+        self.assertLess(len(queries), 15)  # independent of the 50 comments
+        self.blob.refresh_from_db()
+        self.assertEqual(self.blob.ref_count, 0)
+
+    def test_user_delete_discounts_comments_on_other_feeds(self):
+        reader = User.objects.create_user('reader', password='x')
+        own_feed = Feed.objects.create(user=reader, text_content='mine')
+        for i in range(4):
+            CommentRepository.create_comment(self.feed, reader, f'reply {i}')
+            CommentRepository.create_comment(own_feed, self.author, f'answer {i}')
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True) as callbacks:
+            reader.delete()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "feed_app_feed"')]), 1)
+        self.feed.refresh_from_db()
+        self.assertEqual(self.feed.comment_count, 3)
+        self.assertFalse(Feed.objects.filter(id=own_feed.id).exists())
+
+
+class SharedImageVariantTests(TestCase):
+    """An image whose blob already has rendered variants reuses them, found through the blob FK."""
+
+    def test_variants_are_copied_from_a_sibling_on_the_same_blob(self):
+        author = User.objects.create_user('author', password='x')
+        feed = Feed.objects.create(user=author, text_content='post')
+        blob = ImageBlob.objects.create(name='feed_images/blobs/cd/cd.jpg', digest='cd', size=1, ref_count=2)
+        rendered = {'width': 640, 'height': 480, 'thumbnail': 't.jpg', 'medium': 'm.jpg', 'webp': 'w.webp'}
+        FeedImage.objects.create(feed=feed, image=blob.name, blob=blob, order=0, **rendered)
+        # The file does not exist, so this only passes if the variants are copied rather than rendered
+        copy = FeedImage.objects.create(feed=feed, image=blob.name, blob=blob, order=1)
+
+        with CaptureQueriesContext(connection) as queries:
+            generate_image_variants(copy.id)
+        self.assertIn('"blob_id" =', queries[1]['sql'])
+        self.assertEqual(
+            FeedImage.objects.filter(id=copy.id).values('width', 'height', 'thumbnail', 'medium', 'webp').get(), rendered
+        )
+
+
+@override_settings(FEED_MAX_PAGE_SIZE=5)
+class PageSizeLimitTests(TestCase):
+    """Every paginated endpoint caps `limit` at FEED_MAX_PAGE_SIZE and rejects non-numeric or too small values."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='x', is_staff=True)
+        cls.feed = Feed.objects.create(user=cls.author, text_content='kitten')
+        for i in range(7):
+            Feed.objects.create(user=cls.author, text_content=f'kitten {i}')
+            CommentRepository.create_comment(cls.feed, cls.author, f'comment {i}')
+
+    def setUp(self):
+        _clear_caches()
+        self.client.force_login(self.author)
+
+    def test_limit_is_capped(self):
+        pages = {
+            '/api/v1/feeds/': {'cursor': ''},
+            '/api/v1/feeds/search/': {'q': 'kitten'},
+            f'/api/v1/feeds/{self.feed.id}/comments/': {},
+            '/api/v1/async/feeds/': {'cursor': ''},
+            f'/api/v1/async/feeds/{self.feed.id}/comments/': {},
+        }
+        for url, params in pages.items():
+            body = self.client.get(url, {**params, 'limit': 100000}).json()
+            self.assertEqual(len(body['results']), 5, url)
+            self.assertIsNotNone(body['next'], url)
+        self.assertEqual(len(self.client.get('/api/v1/feeds/', {'limit': 100000}).json()), 5)
+
+    def test_invalid_limit_is_rejected(self):
+        for limit in ('abc', '0', '-1'):
+            self.assertEqual(self.client.get('/api/v1/feeds/', {'cursor': '', 'limit': limit}).status_code, 400, limit)
+            self.assertEqual(self.client.get(f'/api/v1/feeds/{self.feed.id}/comments/', {'limit': limit}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/feeds/', {'limit': '-1'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/feeds/', {'limit': '0'}).json(), [])
+
+
+@override_settings(FEED_THROTTLE_RATES={
+    'create': {'ip': '2/min'},
+    'comment': {'user': '3/min'},
+    'report': {'user': '1/min'},
+})
+class WriteThrottleTests(TestCase):
+    """Writes past a bucket's capacity get 429 with Retry-After, per user or per IP; reads are never throttled."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{i}', password='x') for i in range(3)]
+        cls.feeds = [Feed.objects.create(user=cls.users[0], text_content=f'post {i}') for i in range(2)]
+
+    def setUp(self):
+        _clear_caches()
+        # Without Redis the buckets live in process memory; start every test with empty ones
+        patcher = mock.patch.object(throttling, '_local', throttling._LocalBuckets())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(self.users[0])
+
+    def assertThrottled(self, response):
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    def test_user_bucket_limits_comments(self):
+        url = f'/api/v1/feeds/{self.feeds[0].id}/comments/'
+        for i in range(3):
+            self.assertEqual(self.client.post(url, {'text_content': f'comment {i}'}).status_code, 201)
+        self.assertThrottled(self.client.post(url, {'text_content': 'one too many'}))
+        self.assertEqual(Comment.objects.count(), 3)
+
+        self.client.force_login(self.users[1])
+        self.assertEqual(self.client.post(url, {'text_content': 'another user'}).status_code, 201)
+
+    def test_ip_bucket_is_shared_across_users(self):
+        for user in self.users[:2]:
+            self.client.force_login(user)
+            self.assertEqual(self.client.post('/api/v1/feeds/', {'text_content': 'new post'}).status_code, 201)
+        self.client.force_login(self.users[2])
+        self.assertThrottled(self.client.post('/api/v1/feeds/', {'text_content': 'same address'}))
+        self.assertEqual(self.client.post('/api/v1/feeds/', {'text_content': 'other address'}, REMOTE_ADDR='10.0.0.2').status_code, 201)
+
+    def test_async_report_is_throttled(self):
+        self.assertEqual(self.client.post(f'/api/v1/async/feeds/{self.feeds[0].id}/report/').status_code, 200)
+        self.assertThrottled(self.client.post(f'/api/v1/async/feeds/{self.feeds[1].id}/report/'))
+        self.assertThrottled(self.client.post(f'/api/v1/feeds/{self.feeds[1].id}/report/'))
+        self.assertFalse(FeedReport.objects.filter(feed=self.feeds[1]).exists())
+
+    def test_reads_are_not_throttled(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get('/api/v1/feeds/', {'cursor': ''}).status_code, 200)
+            self.assertEqual(self.client.get(f'/api/v1/feeds/{self.feeds[0].id}/comments/').status_code, 200)
+
+
+class MetricsExpositionTests(TestCase):
+    """/metrics serves this process's request and cache metrics in the Prometheus text format, to allowed IPs only."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password='x')
+        Feed.objects.create(user=cls.author, text_content='post')
+
+    def setUp(self):
+        _clear_caches()
+        self.client.force_login(self.author)
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith('#'):
+                sample, value = line.rsplit(' ', 1)
+                samples[sample] = float(value)
+        return response.content.decode(), samples
+
+    def test_requests_are_counted_by_route_and_status(self):
+        requests = 'feed_http_requests_total{route="feed-list",method="GET",status="200"}'
+        rejected = 'feed_http_requests_total{route="feed-list",method="GET",status="400"}'
+        queries = 'feed_http_db_queries_count{route="feed-list",method="GET"}'
+        _, before = self.scrape()
+
+        for params in ({'cursor': ''}, {'cursor': ''}, {'cursor': 'garbage'}):
+            self.client.get('/api/v1/feeds/', params)
+        text, after = self.scrape()
+
+        self.assertIn('# TYPE feed_http_requests_total counter', text)
+        self.assertIn('# TYPE feed_http_request_duration_seconds histogram', text)
+        self.assertEqual(after[requests] - before.get(requests, 0), 2)
+        self.assertEqual(after[rejected] - before.get(rejected, 0), 1)
+        self.assertEqual(after[queries] - before.get(queries, 0), 3)
+        self.assertEqual(after['feed_http_db_queries_bucket{route="feed-list",method="GET",le="+Inf"}'], after[queries])
+        page_lookups = sum(
+            after[key] - before.get(key, 0)
+            for key in (f'feed_cache_requests_total{{route="feed-list",cache="local_page",result="{result}"}}' for result in ('hit', 'miss'))
+            if key in after
+        )
+        self.assertEqual(page_lookups, 3)  # the page cache is consulted before the cursor is decoded
+
+    def test_collectors_are_read_at_scrape_time(self):
+        pool = (('pool', 'postgresql:default'),)
+        with mock.patch.object(metrics, '_collectors', [lambda: [('feed_pool_size', pool, 4), ('feed_pool_idle', pool, 3)]]):
+            _, samples = self.scrape()
+        self.assertEqual(samples['feed_pool_size{pool="postgresql:default"}'], 4)
+        self.assertEqual(samples['feed_pool_idle{pool="postgresql:default"}'], 3)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.9'])
+    def test_other_addresses_get_404(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.9').status_code, 200)
+
+
+class UploadChunkTests(TestCase):
+    """A chunk is written only while its offset is still the session's; a late retry leaves the file alone."""
+
+    def setUp(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        temp_settings = override_settings(FEED_UPLOAD_TEMP_DIR=temp_dir)
+        temp_settings.enable()
+        self.addCleanup(temp_settings.disable)
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 30)).save(buffer, 'PNG')
+        self.data = buffer.getvalue()
+        user = User.objects.create_user('uploader', password='x')
+        self.session = UploadService.start_upload(user, 'a.png', len(self.data))
+
+    def test_retry_of_an_accepted_chunk_is_not_written(self):
+        stale = UploadSession.objects.get(id=self.session.id)  # read before the first attempt landed
+        session = UploadService.append_chunk(self.session, 0, io.BytesIO(self.data[:50]))
+        self.assertEqual(session.received_size, 50)
+
+        self.assertIsNone(UploadService.append_chunk(stale, 0, io.BytesIO(b'x' * 50)))
+        with open(part_path(self.session.id), 'rb') as part:
+            self.assertEqual(part.read(), self.data[:50])
+
+        session = UploadService.append_chunk(session, 50, io.BytesIO(self.data[50:]))
+        self.assertEqual((session.received_size, session.image_format, session.width), (len(self.data), 'PNG', 40))
+        with open(part_path(self.session.id), 'rb') as part:
+            self.assertEqual(part.read(), self.data)
+
+
+class ListingIndexTests(TestCase):
+    """The feed listing and comment pages must be read in index order, never scanned and sorted."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('author', password='x')
+        cls.feeds = [Feed.objects.create(user=author, text_content=f'post {i}') for i in range(40)]
+        Feed.objects.filter(id__in=[feed.id for feed in cls.feeds[::4]]).update(is_active=False)
+        for i in range(10):
+            Comment.objects.create(feed=cls.feeds[1], user=author, text_content=f'comment {i}')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # With a few dozen rows a scan is cheapest; plan as the tables would be at production size
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_bitmapscan = off')
+
+    def assertReadsInIndexOrder(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        # Neither backend may sort the rows itself: the index already returns them in order
+        self.assertNotIn('Sort', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+        self.assertNotRegex(plan, r'Seq Scan on feed_app_(feed|comment)')
+
+    def test_feed_list_uses_active_index(self):
+        queryset = Feed.objects.filter(is_active=True).order_by('-created_at', '-id')
+        self.assertReadsInIndexOrder(_listing_rows(queryset)[:10], 'feed_active_created_id_idx')
+
+    def test_timeline_pages_use_active_index(self):
+        after = (self.feeds[20].created_at, self.feeds[20].id)
+        self.assertReadsInIndexOrder(_feed_entries(None)[:10], 'feed_active_created_id_idx')
+        self.assertReadsInIndexOrder(_feed_entries(after)[:10], 'feed_active_created_id_idx')
+
+    def test_comment_page_uses_feed_index(self):
+        self.assertReadsInIndexOrder(_comments_page_queryset(self.feeds[1], None, 20), 'comment_feed_created_idx')
+
+    def test_archival_reads_use_partial_indexes(self):
+        deactivated, aged_out = _archivable_querysets(self.feeds[20].created_at)
+        self.assertReadsInIndexOrder(deactivated[:500], 'feed_inactive_idx')
+        self.assertReadsInIndexOrder(aged_out[:500], 'feed_active_created_id_idx')
+
+        inactive_ids = [feed.id for feed in self.feeds[::4]]
+        old_active_ids = [feed.id for i, feed in enumerate(self.feeds[:20]) if i % 4]
+        self.assertEqual(ArchiveRepository.get_archivable_feed_ids(), inactive_ids)
+        self.assertEqual(ArchiveRepository.get_archivable_feed_ids(self.feeds[20].created_at), inactive_ids + old_active_ids)
+        self.assertEqual(ArchiveRepository.get_archivable_feed_ids(self.feeds[20].created_at, limit=12), (inactive_ids + old_active_ids)[:12])
+
+
+class ArchiveTests(TestCase):
+    """archive_batch moves feeds with their children to the archive tables; staff read them back from there."""
+
+    def setUp(self):
+        _clear_caches()
+        self.staff = User.objects.create_user('staff', password='x', is_staff=True)
+        self.author = User.objects.create_user('author', password='x')
+        self.blob = ImageBlob.objects.create(name='feed_images/blobs/cd/cd.jpg', digest='cd', size=1, ref_count=1)
+
+        self.removed = Feed.objects.create(user=self.author, text_content='removed')
+        FeedImage.objects.create(feed=self.removed, image=self.blob.name, blob=self.blob)
+        CommentRepository.create_comment(self.removed, self.staff, 'comment')
+        FeedReport.objects.create(feed=self.removed, user=self.staff, reason='spam')
+        Feed.objects.filter(id=self.removed.id).update(is_active=False, report_count=1, image_count=1)
+        self.old = Feed.objects.create(user=self.author, text_content='old')
+        self.recent = Feed.objects.create(user=self.author, text_content='recent')
+
+    def test_batches_move_feeds_and_children_out_of_the_hot_tables(self):
+        self.client.force_login(self.author)
+        listed = [feed['id'] for feed in self.client.get('/api/v1/feeds/', {'cursor': ''}).json()['results']]
+        self.assertEqual(listed, [self.recent.id, self.old.id])
+
+        self.assertEqual(ArchiveService.archive_batch(self.recent.created_at, batch_size=1), 1)  # deactivated first
+        self.assertEqual(ArchiveService.archive_batch(self.recent.created_at, batch_size=1), 1)
+        self.assertEqual(ArchiveService.archive_batch(self.recent.created_at, batch_size=1), 0)
+
+        self.assertEqual(list(Feed.objects.values_list('id', flat=True)), [self.recent.id])
+        for model in (FeedImage, Comment, FeedReport):
+            self.assertFalse(model.objects.exists(), model.__name__)
+        self.assertEqual(sorted(ArchivedFeed.objects.values_list('id', 'is_active')), [(self.removed.id, False), (self.old.id, True)])
+        self.assertEqual(
+            (ArchivedFeedImage.objects.get().blob_id, ArchivedComment.objects.get().feed_id, ArchivedFeedReport.objects.get().feed_id),
+            (self.blob.pk, self.removed.id, self.removed.id),
+        )
+        self.blob.refresh_from_db()
+        self.assertEqual(self.blob.ref_count, 1)
+
+        listed = [feed['id'] for feed in self.client.get('/api/v1/feeds/', {'cursor': ''}).json()['results']]
+        self.assertEqual(listed, [self.recent.id])
+
+    def test_archive_is_readable_by_staff_only(self):
+        ArchiveService.archive_batch(self.recent.created_at)
+
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get('/api/v1/archive/feeds/').status_code, 403)
+
+        self.client.force_login(self.staff)
+        body = self.client.get('/api/v1/archive/feeds/', {'limit': 1}).json()
+        self.assertEqual([feed['id'] for feed in body['results']], [self.old.id])
+        body = self.client.get('/api/v1/archive/feeds/', {'cursor': body['next']}).json()
+        self.assertEqual(([feed['id'] for feed in body['results']], body['next']), ([self.removed.id], None))
+
+        detail = self.client.get(f'/api/v1/archive/feeds/{self.removed.id}/').json()
+        self.assertEqual(
+            (len(detail['images']), [c['text_content'] for c in detail['comments']], [r['reason'] for r in detail['reports']]),
+            (1, ['comment'], ['spam']),
+        )
+        self.assertEqual(self.client.get(f'/api/v1/archive/feeds/{self.recent.id}/').status_code, 404)
+
+
+class FeedEntityStampedeTests(SimpleTestCase):
+    """Concurrent misses on the same feed entries must be built once, not once per request."""
+
+    THREADS = 12
+
+    def setUp(self):
+        _clear_caches()
+        self.feed_ids = [5, 4, 3, 2, 1]
+        self.builds = []
+
+    def _build(self, feed_ids):
+        self.builds.append(list(feed_ids))
+        time.sleep(0.2)  # slow enough that every other caller misses while the first one builds
+        return {feed_id: {'id': feed_id} for feed_id in feed_ids}
+
+    def test_concurrent_misses_rebuild_once(self):
+        with mock.patch.object(FeedService, '_build_entities', side_effect=self._build):
+            results, errors = _run_concurrently(lambda: FeedService._hydrate(self.feed_ids), self.THREADS)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.builds, [sorted(self.feed_ids)])
+        self.assertEqual(len(results), self.THREADS)
+        for entries in results:
+            self.assertEqual([entry['id'] for entry in entries], self.feed_ids)
+
+
+class StaleWhileRevalidateTests(SimpleTestCase):
+    """An expired entry is served stale to everyone while exactly one caller rebuilds it."""
+
+    THREADS = 8
+
+    def setUp(self):
+        _clear_caches()
+        self.builds = []
+
+    def _build(self, ids):
+        self.builds.append(list(ids))
+        time.sleep(0.2)  # slow enough that every other caller arrives mid-rebuild
+        return {item_id: f'v{len(self.builds)}' for item_id in ids}
+
+    def test_stale_entry_is_served_during_single_rebuild(self):
+        keys_by_id = {1: 'stale-test:1'}
+        # A zero TTL leaves the entry stale at once, but still cached for the grace period
+        single_flight.get_many(keys_by_id, self._build, 0, 60, 'test')
+
+        results, errors = _run_concurrently(lambda: single_flight.get_many(keys_by_id, self._build, 300, 60, 'test'), self.THREADS)
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.builds), 2)  # the initial fill plus one refresh
+        self.assertEqual(sorted(result[1] for result in results), ['v1'] * (self.THREADS - 1) + ['v2'])
+        self.assertEqual(single_flight.get_many(keys_by_id, self._build, 300, 60, 'test'), {1: 'v2'})
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Listing reads go to 'replica', while writes, transactions and clients that just wrote stay on 'default'.
+    In tests 'replica' mirrors the test database, so which connection ran a query shows where it was routed.
+    """
+
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        _clear_caches()
+        self.author = User.objects.create_user('author', password='x')
+        self.feed = Feed.objects.create(user=self.author, text_content='hello')
+
+    def assertRoutedTo(self, alias, call):
+        with CaptureQueriesContext(connections['default']) as primary, CaptureQueriesContext(connections['replica']) as replica:
+            result = call()
+        queries = {'default': len(primary), 'replica': len(replica)}
+        other = 'replica' if alias == 'default' else 'default'
+        self.assertGreater(queries[alias], 0)
+        self.assertEqual(queries[other], 0)
+        return result
+
+    def test_listing_reads_use_replica(self):
+        self.assertEqual(self.assertRoutedTo('replica', lambda: FeedRepository.get_feed_by_id(self.feed.id)), self.feed)
+        rows = self.assertRoutedTo('replica', lambda: FeedRepository.get_feed_rows_by_ids([self.feed.id]))
+        self.assertEqual([row['id'] for row in rows], [self.feed.id])
+        self.assertRoutedTo('replica', lambda: CommentRepository.get_comments_page(self.feed))
+
+    def test_writes_and_transactions_use_primary(self):
+        self.assertRoutedTo('default', lambda: CommentRepository.create_comment(self.feed, self.author, 'hi'))
+        with transaction.atomic():
+            self.assertRoutedTo('default', lambda: FeedRepository.get_feed_by_id(self.feed.id))
+
+    def test_entry_rebuilds_read_primary_only_for_recently_changed_feeds(self):
+        other = Feed.objects.create(user=self.author, text_content='untouched')
+        FeedService._invalidate_feed_entries([self.feed.id])
+
+        self.assertRoutedTo('default', lambda: FeedService._build_entities([self.feed.id]))
+        self.assertRoutedTo('replica', lambda: FeedService._build_entities([other.id]))
+
+        # A mixed batch is split: the changed feed from the primary, the rest from the replica
+        with (
+            mock.patch.object(FeedRepository, 'get_feed_rows_by_ids', wraps=FeedRepository.get_feed_rows_by_ids) as rows,
+            CaptureQueriesContext(connections['default']) as primary,
+            CaptureQueriesContext(connections['replica']) as replica,
+        ):
+            entities = FeedService._build_entities([self.feed.id, other.id])
+        self.assertEqual(set(entities), {self.feed.id, other.id})
+        self.assertEqual([call.args[0] for call in rows.call_args_list], [[self.feed.id], [other.id]])
+        self.assertTrue(primary and replica)
+
+    def test_writer_reads_primary_until_pin_expires(self):
+        self.client.force_login(self.author)
+        comments_url = f'/api/v1/feeds/{self.feed.id}/comments/'
+        response = self.client.post(comments_url, {'text_content': 'first'})
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+        response = self.assertRoutedTo('default', lambda: self.client.get(comments_url))
+        self.assertEqual([comment['text_content'] for comment in response.json()['results']], ['first'])
+
+        # Once the pin has expired the same reads go back to the replica
+        self.client.cookies[REPLICA_PIN_COOKIE] = '0'
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.assertEqual(self.client.get(comments_url).status_code, 200)
+        self.assertGreater(len(replica), 0)
@@ -0,0 +1,56 @@
+from django.core.cache import cache
+
+# --- Versioned cache namespaces ---
+# Readers build keys from the namespace's current generation and writers bump it,
+# so invalidation is a single INCR instead of a KEYS scan. Entries left behind by
+# older generations are never read again and simply expire through their own TTL.
+
+FEED_LIST_NAMESPACE = 'feeds_list'
+
+
+def _generation_key(namespace):
+    return f'{namespace}:generation'
+
+
+def get_generation(namespace):
+    """Returns the current generation of `namespace`, creating it on first use."""
+    key = _generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        # add() is atomic, so concurrent first readers agree on the starting value
+        cache.add(key, 0, timeout=None)
+        generation = cache.get(key, 0)
+    return generation
+
+
+def bump_generation(namespace):
+    """Atomically moves `namespace` to a new generation, orphaning every key built from the old one."""
+    key = _generation_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Counter not created yet (or evicted): start it, then bump
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def versioned_keys(namespace, suffixes):
+    """Builds cache keys for `suffixes` inside the current generation of `namespace`, reading the generation once."""
+    generation = get_generation(namespace)
+    return [f'{namespace}:g{generation}:{suffix}' for suffix in suffixes]
+
+
+# --- Async counterparts (ASGI views), built on the async cache API ---
+
+async def aget_generation(namespace):
+    key = _generation_key(namespace)
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, 0, timeout=None)
+        generation = await cache.aget(key, 0)
+    return generation
+
+
+async def aversioned_keys(namespace, suffixes):
+    generation = await aget_generation(namespace)
+    return [f'{namespace}:g{generation}:{suffix}' for suffix in suffixes]
@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.db import connections as databases
+from django.db.backends.signals import connection_created
+from pymongo import MongoClient, monitoring
+
+from . import metrics
+
+# --- Backend connections: one pool per process for each of Postgres, Redis and Mongo ---
+# Postgres: Django's psycopg pool (DATABASES[...]['OPTIONS']['pool']); a request borrows a
+#   connection that is health-checked on checkout and hands it back when it finishes.
+# Redis: every user of the cache backend (cache calls, timeline, throttles, pub/sub) shares the
+#   cache's InstrumentedConnectionPool through redis_client().
+# Mongo: one MongoClient per process, created on first use rather than at logging-config time.
+# Checkouts, newly opened connections and time spent waiting for one are counted per pool in
+# utils.metrics, so 1 - opened / checkouts is the reuse rate.
+
+
+def _labels(pool):
+    return (('pool', pool),)
+
+
+# --- Postgres (and any other DATABASES alias) ---
+
+def _count_checkout(sender, connection, **kwargs):
+    labels = _labels(f'{connection.vendor}:{connection.alias}')
+    metrics.inc('feed_pool_checkouts_total', labels)
+    if not connection.settings_dict['OPTIONS'].get('pool'):
+        # Without a pool every connect() opens a new connection; pooled ones are counted by the pool
+        metrics.inc('feed_pool_connections_opened_total', labels)
+
+
+connection_created.connect(_count_checkout)
+
+
+def _database_pool_stats():
+    for alias in databases:
+        connection = databases[alias]
+        # Read the pools Django has already created; touching `connection.pool` would open one.
+        # `_connection_pools` is private to the postgresql backend (Django 5.1 to 5.2 keep one pool
+        # per alias in it); if a release drops or reshapes it, pool stats are skipped rather than failing.
+        pools = getattr(type(connection), '_connection_pools', None)
+        pool = pools.get(alias) if isinstance(pools, dict) else None
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        labels = _labels(f'{connection.vendor}:{alias}')
+        yield 'feed_pool_connections_opened_total', labels, stats.get('connections_num', 0)
+        yield 'feed_pool_wait_seconds_total', labels, stats.get('requests_wait_ms', 0) / 1000
+        yield 'feed_pool_size', labels, stats.get('pool_size', 0)
+        yield 'feed_pool_idle', labels, stats.get('pool_available', 0)
+        yield 'feed_pool_waiting', labels, stats.get('requests_waiting', 0)
+
+
+metrics.register_collector(_database_pool_stats)
+
+
+# --- Redis ---
+
+class InstrumentedConnectionPool(redis.BlockingConnectionPool):
+    """
+    The cache's Redis pool (CACHES['default']['OPTIONS']['CONNECTION_POOL_CLASS']): at most
+    max_connections per process, and a caller waits up to `timeout` seconds for a free one
+    instead of failing at once.
+    """
+    _LABELS = _labels('redis')
+
+    def make_connection(self):
+        metrics.inc('feed_pool_connections_opened_total', self._LABELS)
+        return super().make_connection()
+
+    def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        connection = super().get_connection(*args, **kwargs)
+        metrics.inc('feed_pool_checkouts_total', self._LABELS)
+        metrics.inc('feed_pool_wait_seconds_total', self._LABELS, time.perf_counter() - start)
+        return connection
+
+
+def redis_client():
+    """The client behind the default cache (sharing its connection pool), or None when the cache is not Redis."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+# --- Mongo ---
+
+class _MongoPoolListener(monitoring.ConnectionPoolListener):
+    _LABELS = _labels('mongo')
+
+    def connection_created(self, event):
+        metrics.inc('feed_pool_connections_opened_total', self._LABELS)
+
+    def connection_checked_out(self, event):
+        metrics.inc('feed_pool_checkouts_total', self._LABELS)
+        # `duration` (seconds spent waiting) only exists from pymongo 4.7 on
+        metrics.inc('feed_pool_wait_seconds_total', self._LABELS, getattr(event, 'duration', None) or 0.0)
+
+    # The remaining events are not counted
+    def pool_created(self, event): pass
+    def pool_ready(self, event): pass
+    def pool_cleared(self, event): pass
+    def pool_closed(self, event): pass
+    def connection_ready(self, event): pass
+    def connection_closed(self, event): pass
+    def connection_check_out_started(self, event): pass
+    def connection_check_out_failed(self, event): pass
+    def connection_checked_in(self, event): pass
+
+
+_mongo = None
+_mongo_pid = None
+_mongo_lock = threading.Lock()
+
+
+def mongo_client():
+    """This process's MongoClient, created on first call. Raises what MongoClient raises for a bad MONGO_URI."""
+    global _mongo, _mongo_pid
+    # A client inherited through fork() must not be used, so each worker process makes its own
+    if _mongo_pid != os.getpid():
+        with _mongo_lock:
+            if _mongo_pid != os.getpid():
+                _mongo = MongoClient(
+                    settings.MONGO_URI,
+                    maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+                    connectTimeoutMS=settings.MONGO_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=settings.MONGO_TIMEOUT_MS,
+                    event_listeners=[_MongoPoolListener()],
+                )
+                _mongo_pid = os.getpid()
+    return _mongo
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from . import connections
+from .loggers import logger
+
+# --- Feed event pub/sub (Server-Sent Events) ---
+# publish() fans an event out to every process through a Redis channel; each process runs one
+# listener thread that hands the pre-rendered SSE frame to its connected clients' queues.
+# Without Redis (e.g. LocMemCache in development) events are delivered in-process only.
+# An idle client is just a coroutine parked on its queue: no polling, no thread.
+
+FEED_EVENTS_CHANNEL = 'feeds:events'
+
+
+def _frame(event, data):
+    return f'event: {event}\ndata: {data}\n\n'
+
+
+class _Subscription:
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=settings.FEED_EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, frame):
+        # Runs on the subscriber's loop. A client too slow to keep up is told to resync instead
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class _Hub:
+    """The clients connected to this process, plus the Redis listener thread that feeds them."""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._listener_pid = None
+
+    def subscribe(self):
+        subscription = _Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+            # Threads do not survive a fork, so each worker process starts its own listener
+            if self._listener_pid != os.getpid() and connections.redis_client() is not None:
+                self._listener_pid = os.getpid()
+                threading.Thread(target=self._listen, name='feed-events-listener', daemon=True).start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def dispatch(self, frame):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, frame)
+            except RuntimeError:
+                self.unsubscribe(subscription)  # its event loop has shut down
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = connections.redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(FEED_EVENTS_CHANNEL)
+                for message in pubsub.listen():
+                    event, data = json.loads(message['data'])
+                    self.dispatch(_frame(event, data))
+            except Exception:
+                logger.error("Feed event listener lost its Redis subscription; retrying", exc_info=True)
+                time.sleep(1)
+
+
+_hub = _Hub()
+
+
+def publish(event, payload):
+    """Sends `event` with a JSON-serializable payload to every connected client. Never raises."""
+    data = json.dumps(payload, separators=(',', ':'))
+    try:
+        client = connections.redis_client()
+        if client is None:
+            _hub.dispatch(_frame(event, data))
+        else:
+            client.publish(FEED_EVENTS_CHANNEL, json.dumps([event, data]))
+    except Exception:
+        logger.error(f"Could not publish feed event {event}", exc_info=True)
+
+
+async def stream():
+    """Async iterator of SSE frames for one client, with a keepalive comment while it is idle."""
+    subscription = _hub.subscribe()
+    try:
+        # Browsers reconnect after this many ms if the connection drops
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                frame = await asyncio.wait_for(subscription.queue.get(), settings.FEED_EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+
+            if subscription.overflowed:
+                # Events were dropped; the client reloads the list instead of patching it
+                subscription.overflowed = False
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                yield _frame('resync', '{}')
+                continue
+            yield frame
+    finally:
+        _hub.unsubscribe(subscription)
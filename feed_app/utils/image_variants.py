@@ -0,0 +1,107 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .loggers import logger
+
+# --- Off-request image variant pipeline ---
+# Uploads are stored as-is on the request path. Resized copies and the pixel
+# dimensions are produced afterwards by a small per-process thread pool.
+
+# field name -> (longest edge in px, Pillow format, file extension)
+VARIANT_SPECS = {
+    'thumbnail': (320, 'JPEG', 'jpg'),
+    'medium': (1080, 'JPEG', 'jpg'),
+    'webp': (1080, 'WEBP', 'webp'),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+                    thread_name_prefix='image-variants',
+                )
+    return _executor
+
+
+def schedule_image_variants(image_ids):
+    """Queues variant generation for these FeedImage ids once the current transaction commits."""
+    if image_ids:
+        transaction.on_commit(lambda: _get_executor().submit(_generate_batch, list(image_ids)))
+
+
+def _generate_batch(image_ids):
+    try:
+        for image_id in image_ids:
+            generate_image_variants(image_id)
+
+        # Cached entries of these feeds were rendered without the variant URLs
+        from feed_app.repositories import FeedRepository
+        from feed_app.services import FeedService
+        FeedService._invalidate_feed_entries(FeedRepository.get_image_feed_ids(image_ids))
+    except Exception:
+        logger.error(f"Image variant generation failed for images {image_ids}", exc_info=True)
+    finally:
+        # Worker threads own their DB connections; don't leak them between jobs
+        close_old_connections()
+
+
+def _render_variant(source, max_edge, image_format):
+    variant = source.copy()
+    variant.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    if image_format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+    buffer = BytesIO()
+    variant.save(buffer, format=image_format, quality=82, optimize=True)
+    return buffer.getvalue()
+
+
+def generate_image_variants(image_id):
+    """Decodes one FeedImage, stores its width/height and writes every VARIANT_SPECS variant."""
+    from feed_app.models import FeedImage
+
+    feed_image = FeedImage.objects.filter(id=image_id).first()
+    if feed_image is None or not feed_image.image:
+        return
+
+    # Re-shared content (same blob) already has its variants rendered. The indexed blob FK identifies it;
+    # rows from before blobs existed can only be matched by file name
+    if feed_image.blob_id:
+        same_content = FeedImage.objects.filter(blob_id=feed_image.blob_id)
+    else:
+        same_content = FeedImage.objects.filter(image=feed_image.image.name)
+    sibling = (
+        same_content
+        .exclude(id=image_id)
+        .exclude(thumbnail='')
+        .values('width', 'height', *VARIANT_SPECS)
+        .first()
+    )
+    if sibling:
+        FeedImage.objects.filter(id=image_id).update(**sibling)
+        return
+
+    with feed_image.image.open('rb') as original:
+        source = ImageOps.exif_transpose(Image.open(original))
+        source.load()
+
+    feed_image.width, feed_image.height = source.size
+    stem = PurePath(feed_image.image.name).stem
+    for field_name, (max_edge, image_format, extension) in VARIANT_SPECS.items():
+        content = ContentFile(_render_variant(source, max_edge, image_format))
+        getattr(feed_image, field_name).save(f'{stem}_{field_name}.{extension}', content, save=False)
+
+    feed_image.save(update_fields=['width', 'height', *VARIANT_SPECS])
@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import connections
+from .loggers import logger
+
+# --- In-process page cache in front of Redis ---
+# The hottest rendered list pages (nearly all traffic is the first one) are kept in each worker's
+# memory for a few seconds, so serving them costs no network round trip at all. Every change that
+# could alter a page calls invalidate(), which is broadcast over a Redis channel: each process runs
+# one listener thread that empties its copy. While that listener is not subscribed (starting up,
+# or reconnecting after a Redis hiccup) nothing is cached, since invalidations could be missed;
+# FEED_LOCAL_CACHE_TTL bounds how stale a page can get should one still slip through.
+# Without Redis (e.g. LocMemCache in development) invalidations reach this process only.
+
+INVALIDATE_CHANNEL = 'feeds:local_cache:invalidate'
+
+
+class _PageCache:
+    """A bounded LRU of (value, expires_at) plus the listener thread that keeps it coherent."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._epoch = 0  # bumped by every clear, so a page rendered before one is never stored after it
+        self._listener_pid = None
+        self._listening = False
+
+    def _usable(self):
+        if not settings.FEED_LOCAL_CACHE_SIZE:
+            return False
+        # Threads do not survive a fork, so each worker process starts its own listener
+        if self._listener_pid != os.getpid():
+            with self._lock:
+                if self._listener_pid != os.getpid():
+                    self._listener_pid = os.getpid()
+                    self._listening = connections.redis_client() is None
+                    if not self._listening:
+                        threading.Thread(target=self._listen, name='feed-local-cache-listener', daemon=True).start()
+        return self._listening
+
+    def get(self, key):
+        """(value or None, epoch); pass the epoch back to set() for the value rendered on a miss."""
+        if not self._usable():
+            return None, None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[0], self._epoch
+            self._entries.pop(key, None)
+            return None, self._epoch
+
+    def set(self, key, value, epoch):
+        if epoch is None:
+            return
+        with self._lock:
+            if epoch != self._epoch or not self._listening:
+                return
+            self._entries[key] = (value, time.monotonic() + settings.FEED_LOCAL_CACHE_TTL)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.FEED_LOCAL_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = connections.redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATE_CHANNEL)
+                # Pages cached before the subscription was in place may have missed an invalidation
+                self.clear()
+                self._listening = True
+                for _ in pubsub.listen():
+                    self.clear()
+            except Exception:
+                logger.error("Local page cache lost its Redis subscription; retrying", exc_info=True)
+            self._listening = False
+            self.clear()
+            time.sleep(1)
+
+
+_pages = _PageCache()
+
+
+def lookup(key):
+    """Returns (page or None, epoch) for `key`; hand the epoch to store() along with the page rendered on a miss."""
+    return _pages.get(key)
+
+
+def store(key, value, epoch):
+    """Caches `value` unless an invalidation happened since the lookup() that returned `epoch`."""
+    _pages.set(key, value, epoch)
+
+
+def invalidate():
+    """Empties the page cache of every process. Never raises."""
+    _pages.clear()
+    try:
+        client = connections.redis_client()
+        if client is not None:
+            client.publish(INVALIDATE_CHANNEL, '1')
+    except Exception:
+        logger.error("Could not broadcast a local page cache invalidation", exc_info=True)
@@ -1,33 +1,64 @@
+import json
 import logging
+import os
+import queue
+import threading
+import time
 import traceback
-from pymongo import MongoClient
+from datetime import datetime, timezone
+from pathlib import Path
+from bson import ObjectId
 from django.conf import settings
+from pymongo.errors import BulkWriteError
 from rest_framework.views import exception_handler
 from rest_framework.response import Response
 from rest_framework import status
 
+from . import metrics
+from .connections import mongo_client
+
 # Logger instance to be used by services
 logger = logging.getLogger('backend_error_logger') 
 
+DUPLICATE_KEY = 11000
+
+
+def _count(outcome, records=1):
+    metrics.inc('feed_error_log_records_total', (('outcome', outcome),), records)
+
+
 class MongoLogHandler(logging.Handler):
-    """Custom logging handler to send logs to a MongoDB collection."""
+    """
+    Custom logging handler to send logs to a MongoDB collection without blocking the caller.
+    emit() only builds the document and puts it on a bounded queue; a background thread
+    writes batches with insert_many. Batches Mongo rejects go to an on-disk spool that is
+    replayed once inserts succeed again. Every record gets its _id up front, so one written by
+    a batch that later failed is not stored twice. The Mongo client is only created by the
+    first write, so configuring logging never waits on it. Counts are reported at /metrics.
+    """
 
     def __init__(self):
         logging.Handler.__init__(self)
-        try:
-            # Requires MONGO_URI and MONGO_DB in settings.py
-            client = MongoClient(settings.MONGO_URI)
-            db = client[settings.MONGO_DB]
-            self.collection = db['error_logs'] 
-        except Exception:
-            self.collection = None
+        self.queue = queue.Queue(maxsize=settings.MONGO_LOG_QUEUE_SIZE)
+        self.batch_size = settings.MONGO_LOG_BATCH_SIZE
+        self.flush_seconds = settings.MONGO_LOG_FLUSH_SECONDS
+        self.spool_dir = Path(settings.MONGO_LOG_SPOOL_DIR)
+        self.spool_max_bytes = settings.MONGO_LOG_SPOOL_MAX_BYTES
+        self._write_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
 
-    def emit(self, record):
-        if not self.collection: return
+    @property
+    def collection(self):
+        # Requires MONGO_URI and MONGO_DB in settings.py; shared with the rest of the process (utils.connections)
+        return mongo_client()[settings.MONGO_DB]['error_logs']
 
+    def emit(self, record):
         try:
             log_entry = {
-                'timestamp': self.format(record.created),
+                '_id': ObjectId(),
+                'timestamp': datetime.fromtimestamp(record.created, tz=timezone.utc),
                 'level': record.levelname,
                 'message': record.getMessage(),
                 'pathname': record.pathname,
@@ -35,13 +66,136 @@ class MongoLogHandler(logging.Handler):
             }
 
             if record.exc_info:
-                log_entry['stack_trace'] = traceback.format_exc()
-            
-            self.collection.insert_one(log_entry)
+                log_entry['stack_trace'] = ''.join(traceback.format_exception(*record.exc_info))
 
+            self._ensure_worker()
+            self.queue.put_nowait(log_entry)
+            _count('queued')
+
+        except queue.Full:
+            _count('dropped') # Never make the caller wait on a backed-up logging backend
         except Exception:
             pass # Fail silently if logging fails
 
+    def close(self):
+        """Writes whatever is still queued (to Mongo, or the spool) before the process exits."""
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+        logging.Handler.close(self)
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so pre-forked workers each start their own
+        if self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker_pid != os.getpid() or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._drain, name='mongo-log-writer', daemon=True)
+                self._worker_pid = os.getpid()
+                self._worker.start()
+
+    def _drain(self):
+        """Flushes a batch once batch_size records are waiting or flush_seconds have passed."""
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        with self._write_lock:
+            try:
+                _count('inserted', self._insert(batch))
+            except Exception:
+                self._spool(batch)
+                return
+            self._replay_spool()
+
+    def _insert(self, entries):
+        """
+        insert_many that skips records already in the collection (a retry of a batch that was
+        partly written before it failed). Returns how many were new; raises on any other error.
+        """
+        try:
+            return len(self.collection.insert_many(entries, ordered=False).inserted_ids)
+        except BulkWriteError as exc:
+            if exc.details.get('writeConcernErrors') or any(
+                error.get('code') != DUPLICATE_KEY for error in exc.details.get('writeErrors', [])
+            ):
+                raise
+            return exc.details.get('nInserted', 0)
+
+    # --- On-disk Spool ---
+
+    def _spool_path(self, pid=None):
+        return self.spool_dir / f'error_logs.{pid or os.getpid()}.jsonl'
+
+    def _spool(self, batch):
+        try:
+            path = self._spool_path()
+            if path.exists() and path.stat().st_size >= self.spool_max_bytes:
+                _count('dropped', len(batch))
+                return
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as spool:
+                for entry in batch:
+                    spool.write(json.dumps(
+                        {**entry, '_id': str(entry['_id']), 'timestamp': entry['timestamp'].isoformat()}
+                    ) + '\n')
+            _count('spooled', len(batch))
+        except Exception:
+            _count('dropped', len(batch))
+
+    def _replay_spool(self):
+        """Moves this process's spool (and any left by dead processes) back into Mongo."""
+        if not self.spool_dir.is_dir():
+            return
+        for path in self.spool_dir.glob('error_logs.*.jsonl'):
+            pid = int(path.name.split('.')[1])
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            claimed = path.with_name(f'{path.name}.{os.getpid()}.replay')
+            try:
+                os.replace(path, claimed)  # a concurrent replayer loses the race instead of duplicating
+            except OSError:
+                continue
+
+            with open(claimed, encoding='utf-8') as spool:
+                entries = [json.loads(line) for line in spool if line.strip()]
+            for entry in entries:
+                entry['_id'] = ObjectId(entry['_id']) if '_id' in entry else ObjectId()
+                entry['timestamp'] = datetime.fromisoformat(entry['timestamp'])
+            for start in range(0, len(entries), self.batch_size):
+                try:
+                    _count('replayed', self._insert(entries[start:start + self.batch_size]))
+                except Exception:
+                    # Records of the failed chunk that did get in are skipped by the next replay
+                    self._spool(entries[start:])
+                    break
+            claimed.unlink()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
 # --- Global DRF Exception Handler ---
 def custom_exception_handler(exc, context):
     """
@@ -0,0 +1,184 @@
+import time
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+
+# --- Per-process request metrics, exposed in the Prometheus text format at /metrics ---
+# Every thread writes into its own shard (plain dicts, no locks on the request path); a scrape
+# sums the shards. Each worker process reports its own numbers, so scrape every worker (or
+# aggregate by instance) rather than going through a load balancer.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'feed_http_requests_total': ('counter', "Requests by route, method and status.", None),
+    'feed_http_request_duration_seconds': ('histogram', "Wall time until the response (headers) left the view.", LATENCY_BUCKETS),
+    'feed_http_db_duration_seconds': ('histogram', "Time spent in SQL per request.", LATENCY_BUCKETS),
+    'feed_http_db_queries': ('histogram', "SQL statements per request.", QUERY_COUNT_BUCKETS),
+    'feed_http_response_size_bytes': ('histogram', "Response body size (streaming responses excluded).", SIZE_BUCKETS),
+    'feed_cache_requests_total': ('counter', "Cache lookups by route, cache and result (hit/miss).", None),
+    'feed_pool_checkouts_total': ('counter', "Connections handed out, by pool (postgresql:<alias>, redis, mongo).", None),
+    'feed_pool_connections_opened_total': ('counter', "New connections opened to the backend, by pool.", None),
+    'feed_pool_wait_seconds_total': ('counter', "Time spent waiting for a pooled connection, by pool.", None),
+    'feed_pool_size': ('gauge', "Connections held by a database pool.", None),
+    'feed_pool_idle': ('gauge', "Idle connections in a database pool.", None),
+    'feed_pool_waiting': ('gauge', "Requests queued for a database pool connection.", None),
+    'feed_error_log_records_total': ('counter', "Error log records shipped to Mongo, by outcome (queued, inserted, spooled, replayed, dropped).", None),
+}
+
+MAX_SLOW_QUERIES_LOGGED = 50
+
+
+class _Shard:
+    def __init__(self):
+        self.counters = defaultdict(float)  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+
+
+_shards = []
+_shards_lock = threading.Lock()
+_thread_state = threading.local()
+_collectors = []  # callables yielding (name, labels, value) read at scrape time
+
+
+def _shard():
+    shard = getattr(_thread_state, 'shard', None)
+    if shard is None:
+        # Once per thread: the only point that takes a lock
+        shard = _thread_state.shard = _Shard()
+        with _shards_lock:
+            _shards.append(shard)
+    return shard
+
+
+def inc(name, labels, value=1):
+    _shard().counters[(name, labels)] += value
+
+
+def observe(name, labels, value):
+    buckets = METRICS[name][2]
+    histogram = _shard().histograms.get((name, labels))
+    if histogram is None:
+        histogram = _shard().histograms[(name, labels)] = [0] * (len(buckets) + 2)
+    histogram[bisect_left(buckets, value)] += 1
+    histogram[-1] += value
+
+
+def register_collector(collect):
+    """Adds a callable yielding (name, labels, value) for values that are read at scrape time (e.g. pool stats)."""
+    _collectors.append(collect)
+
+
+# --- Per-request statistics (filled by the query wrapper and record_cache) ---
+
+class RequestStats:
+    def __init__(self, capture_sql=False):
+        self.db_time = 0.0
+        self.queries = 0
+        self.cache = defaultdict(int)  # (cache, 'hit' | 'miss') -> count
+        self.sql = [] if capture_sql else None
+
+
+# A context variable follows the request into sync_to_async threads, where async views run their SQL
+_current = ContextVar('feed_request_stats', default=None)
+
+
+def start_request(capture_sql=False):
+    stats = RequestStats(capture_sql)
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_cache(cache_name, hits, misses):
+    """Counts lookups against a cache (e.g. 'feed_entity', 'timeline') for the current request's route."""
+    stats = _current.get()
+    if stats is not None:
+        stats.cache[(cache_name, 'hit')] += hits
+        stats.cache[(cache_name, 'miss')] += misses
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.db_time += elapsed
+        stats.queries += 1
+        if stats.sql is not None and len(stats.sql) < MAX_SLOW_QUERIES_LOGGED:
+            stats.sql.append((round(elapsed * 1000, 2), sql))
+
+
+def _install_query_wrapper(sender, connection, **kwargs):
+    # Connections are per thread and reconnect over their lifetime; wrap each once
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(_install_query_wrapper)
+
+
+# --- Exposition ---
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+def render():
+    """All metrics of this process in the Prometheus text exposition format."""
+    counters = defaultdict(float)
+    histograms = {}
+    with _shards_lock:
+        shards = list(_shards)
+    for shard in shards:
+        # Copies are taken in one step each; a write racing the scrape lands in the next one
+        for key, value in list(shard.counters.items()):
+            counters[key] += value
+        for key, values in list(shard.histograms.items()):
+            merged = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(list(values)):
+                merged[i] += value
+    for collect in _collectors:
+        for name, labels, value in collect():
+            counters[(name, labels)] += value
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind in ('counter', 'gauge'):
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            continue
+
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, '+Inf'), values):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(values[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
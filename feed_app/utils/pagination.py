@@ -0,0 +1,47 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+# --- Keyset (cursor) pagination helpers ---
+
+def encode_cursor(created_at, pk):
+    """Builds an opaque cursor pointing just past the row with this (created_at, id)."""
+    raw = json.dumps([created_at.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Returns the (created_at, id) pair held by `cursor`. Raises ValueError if it is malformed."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+
+def rows_before(created_at, pk):
+    """
+    Filter for rows that sort after the cursor position in (-created_at, -id) order.
+    The leading `created_at <= x` term gives Postgres an index range to scan instead of a filter.
+    """
+    return Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+
+
+def encode_rank_cursor(rank, pk):
+    """Cursor for result lists ordered by (-rank, -id), e.g. search; `rank` is a float."""
+    raw = json.dumps([rank, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_rank_cursor(cursor):
+    """Returns the (rank, id) pair held by `cursor`. Raises ValueError if it is malformed."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        rank, pk = json.loads(base64.urlsafe_b64decode(padded))
+        return float(rank), int(pk)
+    except (TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor.") from e
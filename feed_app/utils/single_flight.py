@@ -0,0 +1,156 @@
+import asyncio
+import random
+import time
+
+from django.core.cache import cache
+
+from . import metrics
+
+# --- Stampede protection for cached entries ---
+# Values are stored as (value, fresh_until) and kept `grace` seconds past that. A stale copy is
+# still served while the one worker holding a short rebuild lock recomputes it; on an outright
+# miss the other workers wait briefly for that rebuild instead of running the same queries.
+# TTLs get jitter, so entries written at the same moment don't all expire at the same moment.
+
+LOCK_TIMEOUT = 5  # seconds; the longest a crashed builder can hold others back
+WAIT_TIMEOUT = 2.0  # seconds a worker waits for another's rebuild before doing it itself
+POLL_INTERVAL = 0.02
+TTL_JITTER = 0.1  # +/- share of the TTL
+
+
+def _lock_key(key):
+    return f'{key}:rebuild'
+
+
+def _split(keys_by_id, cached):
+    """(values, stale ids, missing ids) from a get_many result."""
+    now = time.time()
+    values, stale, missing = {}, [], []
+    for item_id, key in keys_by_id.items():
+        entry = cached.get(key)
+        if entry is None:
+            missing.append(item_id)
+            continue
+        values[item_id], fresh_until = entry
+        if fresh_until <= now:
+            stale.append(item_id)
+    return values, stale, missing
+
+
+def _envelopes(keys_by_id, built, ttl, grace):
+    """(entries for set_many, timeout) with a jittered freshness window."""
+    fresh_for = ttl * random.uniform(1 - TTL_JITTER, 1 + TTL_JITTER)
+    fresh_until = time.time() + fresh_for
+    return {keys_by_id[item_id]: (value, fresh_until) for item_id, value in built.items()}, fresh_for + grace
+
+
+def _poll_result(keys_by_id, pending, cached):
+    """Sorts ids being rebuilt elsewhere into (found values, still locked, given up on)."""
+    found, locked, abandoned = {}, [], []
+    for item_id in pending:
+        key = keys_by_id[item_id]
+        if key in cached:
+            found[item_id] = cached[key][0]
+        elif _lock_key(key) in cached:
+            locked.append(item_id)
+        else:
+            # The builder finished without storing it (e.g. the row is gone) or gave up
+            abandoned.append(item_id)
+    return found, locked, abandoned
+
+
+def get_many(keys_by_id, build, ttl, grace, name):
+    """
+    Cached values for `keys_by_id` ({id: cache key}), rebuilding what is missing or stale through
+    build(ids) -> {id: value} at most once across workers. Ids build() doesn't return are left out.
+    `name` labels the hits and misses in utils.metrics.
+    """
+    values, stale, missing = _split(keys_by_id, cache.get_many(list(keys_by_id.values())))
+    metrics.record_cache(name, len(values), len(missing))
+    if not stale and not missing:
+        return values
+
+    # Locks are taken in id order and only up to the first one held elsewhere, so two workers
+    # missing the same page don't each end up rebuilding half of it
+    owned = []
+    for item_id in sorted(stale + missing):
+        if not cache.add(_lock_key(keys_by_id[item_id]), 1, LOCK_TIMEOUT):
+            break
+        owned.append(item_id)
+    if owned:
+        try:
+            built = build(owned)
+            for item_id in owned:
+                if item_id not in built:
+                    values.pop(item_id, None)  # gone since it was cached; don't serve the stale copy
+            entries, timeout = _envelopes(keys_by_id, built, ttl, grace)
+            cache.set_many(entries, timeout)
+            values.update(built)
+        finally:
+            cache.delete_many([_lock_key(keys_by_id[item_id]) for item_id in owned])
+
+    # Stale ids someone else is refreshing are served as they are; missing ones are waited for
+    owned = set(owned)
+    pending = [item_id for item_id in missing if item_id not in owned]
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    leftover = []
+    while pending and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        keys = [keys_by_id[item_id] for item_id in pending]
+        found, pending, abandoned = _poll_result(keys_by_id, pending, cache.get_many(keys + [_lock_key(key) for key in keys]))
+        values.update(found)
+        leftover += abandoned
+
+    leftover += pending
+    if leftover:
+        built = build(leftover)
+        entries, timeout = _envelopes(keys_by_id, built, ttl, grace)
+        cache.set_many(entries, timeout)
+        values.update(built)
+    return values
+
+
+async def aget_many(keys_by_id, build, ttl, grace, name):
+    """get_many for async callers: async cache API, awaitable build(ids), no blocking sleeps."""
+    values, stale, missing = _split(keys_by_id, await cache.aget_many(list(keys_by_id.values())))
+    metrics.record_cache(name, len(values), len(missing))
+    if not stale and not missing:
+        return values
+
+    owned = []
+    for item_id in sorted(stale + missing):
+        if not await cache.aadd(_lock_key(keys_by_id[item_id]), 1, LOCK_TIMEOUT):
+            break
+        owned.append(item_id)
+    if owned:
+        try:
+            built = await build(owned)
+            for item_id in owned:
+                if item_id not in built:
+                    values.pop(item_id, None)  # gone since it was cached; don't serve the stale copy
+            entries, timeout = _envelopes(keys_by_id, built, ttl, grace)
+            await cache.aset_many(entries, timeout)
+            values.update(built)
+        finally:
+            await cache.adelete_many([_lock_key(keys_by_id[item_id]) for item_id in owned])
+
+    owned = set(owned)
+    pending = [item_id for item_id in missing if item_id not in owned]
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    leftover = []
+    while pending and time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        keys = [keys_by_id[item_id] for item_id in pending]
+        found, pending, abandoned = _poll_result(
+            keys_by_id, pending, await cache.aget_many(keys + [_lock_key(key) for key in keys])
+        )
+        values.update(found)
+        leftover += abandoned
+
+    leftover += pending
+    if leftover:
+        built = await build(leftover)
+        entries, timeout = _envelopes(keys_by_id, built, ttl, grace)
+        await cache.aset_many(entries, timeout)
+        values.update(built)
+    return values
@@ -0,0 +1,57 @@
+import hashlib
+import os
+import uuid
+from pathlib import PurePosixPath
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# --- Storage backends for uploaded feed images ---
+
+BLOB_DIR = 'feed_images/blobs'
+
+
+def blob_digest(name):
+    """sha256 hex digest encoded in a content-addressed storage name."""
+    return PurePosixPath(name).stem
+
+
+@deconstructible
+class ReplacingStorage(FileSystemStorage):
+    """
+    Saves under exactly the requested name: content goes to a unique temp file that is
+    then renamed over the target, so concurrent writers of the same (derived) file never
+    produce suffixed duplicates such as `x_AbC123.jpg`.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        partial_name = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+        os.replace(self.path(partial_name), self.path(name))
+        return name
+
+
+@deconstructible
+class ContentAddressedStorage(ReplacingStorage):
+    """
+    Stores every upload once, under the sha256 of its bytes:
+    feed_images/blobs/<2 hex chars>/<digest><ext>. The name handed to save() only
+    contributes its extension. Re-uploading bytes that are already stored writes
+    nothing and returns the existing name; ImageBlob rows count the references.
+    """
+
+    def _save(self, name, content):
+        # Uploads are already in memory or in Django's temp file, so hashing them
+        # first costs a read, and it lets duplicates skip the write entirely
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+
+        hexdigest = digest.hexdigest()
+        blob_name = f'{BLOB_DIR}/{hexdigest[:2]}/{hexdigest}{PurePosixPath(name).suffix.lower()}'
+        if self.exists(blob_name):
+            return blob_name
+        return super()._save(blob_name, content)
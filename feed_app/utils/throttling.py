@@ -0,0 +1,136 @@
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+from . import connections
+from .loggers import logger
+
+# --- Token-bucket throttling for the write endpoints ---
+# Each (scope, user) and (scope, client IP) pair owns a bucket holding up to N tokens that refills
+# continuously at N per period (FEED_THROTTLE_RATES, e.g. '10/min'), so short bursts pass and a steady
+# flood does not. One Lua script checks and debits all of a request's buckets atomically against Redis
+# time, so concurrent requests on different processes can't overdraw them. Without Redis (or while it is
+# unreachable) the buckets live in process memory instead: the same limits, enforced per process.
+
+_KEY_PREFIX = 'throttle'
+
+# KEYS: buckets; ARGV: capacity, tokens per second (per key). Returns the seconds to wait as a string, '0' if debited
+_TAKE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity, per_second = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local level = tonumber(bucket[1]) or capacity
+    local since = tonumber(bucket[2]) or now
+    level = math.min(capacity, level + math.max(0, now - since) * per_second)
+    tokens[i] = level
+    if level < 1 then
+        wait = math.max(wait, (1 - level) / per_second)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    local capacity, per_second = tonumber(ARGV[2 * i - 1]), tonumber(ARGV[2 * i])
+    redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity / per_second * 1000))
+end
+return '0'
+"""
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def _parse_rate(rate):
+    """'10/min' -> (capacity 10, 10/60 tokens per second); same format as DRF's throttle rates."""
+    count, period = rate.split('/')
+    capacity = int(count)
+    return capacity, capacity / _PERIODS[period[0]]
+
+
+class _LocalBuckets:
+    """In-process fallback with the same semantics as _TAKE_SCRIPT."""
+
+    MAX_BUCKETS = 10_000
+
+    def __init__(self):
+        self._buckets = {}  # key -> (tokens, monotonic timestamp, time it is full again)
+        self._lock = threading.Lock()
+
+    def take(self, buckets):
+        now = time.monotonic()
+        with self._lock:
+            levels, wait = [], 0.0
+            for key, capacity, per_second in buckets:
+                level, since, _ = self._buckets.get(key, (capacity, now, now))
+                level = min(capacity, level + (now - since) * per_second)
+                levels.append(level)
+                if level < 1:
+                    wait = max(wait, (1 - level) / per_second)
+            if wait:
+                return wait
+
+            if len(self._buckets) > self.MAX_BUCKETS:
+                self._prune(now)
+            for (key, capacity, per_second), level in zip(buckets, levels):
+                self._buckets[key] = (level - 1, now, now + (capacity - level + 1) / per_second)
+            return 0.0
+
+    def _prune(self, now):
+        # A bucket that has refilled completely holds no information
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+
+
+_local = _LocalBuckets()
+
+
+def take(scope, user_id=None, ip=None):
+    """
+    Debits one token from `scope`'s per-user and per-IP buckets (FEED_THROTTLE_RATES[scope]).
+    Returns 0 when the request may proceed, otherwise the seconds until it would be allowed.
+    """
+    rates = settings.FEED_THROTTLE_RATES.get(scope, {})
+    buckets = [
+        (f'{_KEY_PREFIX}:{scope}:{kind}:{ident}', *_parse_rate(rates[kind]))
+        for kind, ident in (('user', user_id), ('ip', ip))
+        if ident is not None and rates.get(kind)
+    ]
+    if not buckets:
+        return 0.0
+
+    client = connections.redis_client()
+    if client is not None:
+        try:
+            args = [value for _, capacity, per_second in buckets for value in (capacity, per_second)]
+            wait = client.register_script(_TAKE_SCRIPT)(keys=[key for key, _, _ in buckets], args=args)
+            return float(wait)
+        except Exception:
+            logger.error(f"Throttle check for {scope} failed; using in-process buckets", exc_info=True)
+    return _local.take(buckets)
+
+
+def client_ip(request):
+    """The client address as DRF's throttles see it (honours REST_FRAMEWORK['NUM_PROXIES'])."""
+    return BaseThrottle().get_ident(request)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle over `take()`; a denied request gets 429 with a Retry-After header."""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self._wait = 0.0
+
+    def allow_request(self, request, view):
+        user_id = request.user.pk if request.user and request.user.is_authenticated else None
+        self._wait = take(self.scope, user_id, self.get_ident(request))
+        return not self._wait
+
+    def wait(self):
+        return self._wait
@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+
+from . import connections
+from .loggers import logger
+
+# --- Redis timeline of active feeds ---
+# A sorted set of feed ids scored by created_at (epoch microseconds). Members are zero-padded ids,
+# so equal scores come back newest id first, the same (-created_at, -id) order the DB uses.
+# It holds at most FEED_TIMELINE_MAX_SIZE entries; pages past its tail fall back to the DB.
+# A sentinel member at -inf marks the set as built (an empty timeline still exists).
+# Every function returns None / does nothing when the cache is not Redis (e.g. LocMemCache).
+
+TIMELINE_KEY = 'feeds:timeline'
+_BUILDING_KEY = 'feeds:timeline:building'
+_REBUILD_LOCK_KEY = 'feeds:timeline:rebuild_lock'
+_SENTINEL = 'built'
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Adds only to timelines that exist (incl. one being rebuilt), so a write never creates a partial timeline
+_ADD_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('ZADD', key, ARGV[1], ARGV[2])
+        if i == 1 then
+            redis.call('ZREMRANGEBYRANK', key, 1, -tonumber(ARGV[3]) - 1)
+        end
+    end
+end
+return 1
+"""
+
+
+def _score(created_at):
+    return (created_at - _EPOCH) // timedelta(microseconds=1)
+
+
+def _created_at(score):
+    return _EPOCH + timedelta(microseconds=int(score))
+
+
+def _member(feed_id):
+    return f'{feed_id:020d}'
+
+
+def add(feed_id, created_at):
+    client = connections.redis_client()
+    if client is None:
+        return
+    try:
+        client.register_script(_ADD_SCRIPT)(
+            keys=[TIMELINE_KEY, _BUILDING_KEY],
+            args=[_score(created_at), _member(feed_id), settings.FEED_TIMELINE_MAX_SIZE],
+        )
+    except Exception:
+        logger.error(f"Could not add feed {feed_id} to the timeline", exc_info=True)
+
+
+def remove(feed_id):
+    client = connections.redis_client()
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline()
+        pipe.zrem(TIMELINE_KEY, _member(feed_id))
+        pipe.zrem(_BUILDING_KEY, _member(feed_id))
+        pipe.execute()
+    except Exception:
+        logger.error(f"Could not remove feed {feed_id} from the timeline", exc_info=True)
+
+
+def rebuild(loader):
+    """
+    Rebuilds the timeline from loader(max_size) -> [(feed_id, created_at)], newest first.
+    Only one process rebuilds at a time; returns False if another one holds the lock.
+    """
+    client = connections.redis_client()
+    if client is None or not client.set(_REBUILD_LOCK_KEY, 1, nx=True, ex=60):
+        return False
+    try:
+        # Writes landing while the DB is read go into the building set too (see _ADD_SCRIPT)
+        pipe = client.pipeline()
+        pipe.delete(_BUILDING_KEY)
+        pipe.zadd(_BUILDING_KEY, {_SENTINEL: float('-inf')})
+        pipe.expire(_BUILDING_KEY, 120)
+        pipe.execute()
+
+        entries = loader(settings.FEED_TIMELINE_MAX_SIZE)
+        for start in range(0, len(entries), 1000):
+            client.zadd(_BUILDING_KEY, {
+                _member(feed_id): _score(created_at) for feed_id, created_at in entries[start:start + 1000]
+            })
+
+        pipe = client.pipeline()
+        pipe.persist(_BUILDING_KEY)
+        pipe.rename(_BUILDING_KEY, TIMELINE_KEY)
+        pipe.zremrangebyrank(TIMELINE_KEY, 1, -settings.FEED_TIMELINE_MAX_SIZE - 1)
+        pipe.execute()
+        return True
+    finally:
+        client.delete(_REBUILD_LOCK_KEY)
+
+
+def page(after=None, limit=10, offset=0, loader=None):
+    """
+    Up to `limit` (feed_id, created_at) entries, newest first, strictly older than the
+    `after` (created_at, feed_id) position. Returns None when the timeline can't answer:
+    no Redis, not built (and `loader` could not rebuild it), or the page runs past its tail.
+    """
+    client = connections.redis_client()
+    if client is None:
+        return None
+    try:
+        entries = _read_page(client, after, limit, offset)
+        if entries is None and loader is not None and rebuild(loader):
+            entries = _read_page(client, after, limit, offset)
+        return entries
+    except Exception:
+        logger.error("Timeline read failed; falling back to the database", exc_info=True)
+        return None
+
+
+def _read_page(client, after, limit, offset):
+    pipe = client.pipeline()
+    pipe.zcard(TIMELINE_KEY)
+    if after is None:
+        pipe.zrevrangebyscore(TIMELINE_KEY, '+inf', '(-inf', start=offset, num=limit, withscores=True)
+    else:
+        after_score = _score(after[0])
+        # Members sharing the cursor's score are filtered below; fetch enough to cover them
+        pipe.zcount(TIMELINE_KEY, after_score, after_score)
+    size, result = pipe.execute()
+    if not size:
+        return None
+
+    if after is None:
+        rows = result
+    else:
+        rows = client.zrevrangebyscore(TIMELINE_KEY, after_score, '(-inf', start=0, num=limit + result, withscores=True)
+        after_member = _member(after[1]).encode()
+        rows = [(member, score) for member, score in rows if score < after_score or member < after_member][:limit]
+
+    # A full timeline may have been trimmed, so running out of entries does not mean the feed ended
+    if len(rows) < limit and size - 1 >= settings.FEED_TIMELINE_MAX_SIZE:
+        return None
+    return [(int(member), _created_at(score)) for member, score in rows]
@@ -0,0 +1,76 @@
+import os
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image, UnidentifiedImageError
+
+# --- Chunked upload sessions: on-disk assembly and header checks ---
+
+ALLOWED_IMAGE_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+STREAM_BLOCK_SIZE = 64 * 1024
+# Give up on finding a parseable header after this many bytes (large EXIF blocks come first in JPEGs)
+MAX_HEADER_PROBE_BYTES = 1024 * 1024
+
+
+def part_path(session_id):
+    """Local file a session's chunks are assembled in (same filesystem as MEDIA_ROOT, so finalize can rename)."""
+    return os.path.join(settings.FEED_UPLOAD_TEMP_DIR, f'{session_id}.part')
+
+
+def write_chunk(session_id, offset, stream, max_bytes):
+    """
+    Streams up to `max_bytes` from `stream` into the session file at `offset`, block by block,
+    without buffering the chunk in memory. Returns the byte count, or None if the stream held more.
+    """
+    path = part_path(session_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+    try:
+        os.lseek(fd, offset, os.SEEK_SET)
+        while True:
+            block = stream.read(STREAM_BLOCK_SIZE)
+            if not block:
+                return written
+            if written + len(block) > max_bytes:
+                return None
+            os.write(fd, block)
+            written += len(block)
+    finally:
+        os.close(fd)
+
+
+def probe_image_header(session_id, received_size, complete):
+    """
+    Reads only the image header (Pillow decodes lazily) to learn (format, width, height).
+    Returns None while more bytes are needed; raises ValueError if the upload is not an acceptable image.
+    """
+    try:
+        with Image.open(part_path(session_id)) as image:
+            image_format, (width, height) = image.format, image.size
+    except (UnidentifiedImageError, OSError, SyntaxError) as e:
+        if complete or received_size >= MAX_HEADER_PROBE_BYTES:
+            raise ValueError("Upload is not a readable image.") from e
+        return None
+    except Image.DecompressionBombError as e:
+        raise ValueError("Image dimensions are too large.") from e
+
+    if image_format not in ALLOWED_IMAGE_FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}.")
+    if width * height > settings.FEED_UPLOAD_MAX_PIXELS:
+        raise ValueError("Image dimensions are too large.")
+    return image_format, width, height
+
+
+def discard_part(session_id):
+    try:
+        os.remove(part_path(session_id))
+    except FileNotFoundError:
+        pass
+
+
+class PartFile(File):
+    """An assembled upload on local disk; FileSystemStorage moves it into place instead of copying it."""
+
+    def temporary_file_path(self):
+        return self.file.name
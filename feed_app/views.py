@@ -1,24 +1,38 @@
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
+from django.utils.cache import get_conditional_response
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
-from rest_framework import viewsets, status
+from rest_framework import exceptions, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from feed_app.services import FeedService, CommentService
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from feed_app.services import ArchiveService, FeedService, CommentService, UploadService
+from feed_app.utils import events, metrics, throttling
 from .serializers import (
     FeedListSerializer, 
     FeedCreateSerializer, 
     CommentSerializer, 
-    UserRegisterSerializer
+    UserRegisterSerializer,
+    UploadStartSerializer,
+    UploadSessionSerializer,
+    UploadFinalizeSerializer,
+    ArchivedFeedSerializer,
+    ArchivedFeedDetailSerializer,
 )
 
 # --- Frontend Views with Authentication Logic ---
 from rest_framework.parsers import MultiPartParser, FormParser
 @require_http_methods(["GET"])
-def feed_list_ui(request):
+async def feed_list_ui(request):
     """Renders the main Django Template UI, requiring authentication."""
+    # Resolve the session user on the event loop; render() then reads it without a blocking query
+    request.user = await request.auser()
     if not request.user.is_authenticated:
         return redirect('login') 
         
@@ -80,23 +94,86 @@ def user_logout(request):
     return redirect('login')
 
 
+@require_http_methods(["GET"])
+def metrics_view(request):
+    """Prometheus scrape endpoint: this process's request and cache metrics."""
+    allowed = settings.METRICS_ALLOWED_IPS
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        raise Http404
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def _parse_limit(params, default, minimum=1):
+    """The `limit` query parameter, capped at FEED_MAX_PAGE_SIZE. Raises ValueError unless it is an integer >= minimum."""
+    limit = int(params.get('limit', default))
+    if limit < minimum:
+        raise ValueError("Invalid pagination parameters.")
+    return min(limit, settings.FEED_MAX_PAGE_SIZE)
+
+
 # --- DRF ViewSet (Backend APIs) ---
 class FeedViewSet(viewsets.ViewSet):
     print("==========================")
     permission_classes = [IsAuthenticated]
 
+    def get_throttles(self):
+        # Only the writes are throttled; each of them invalidates cached listing data
+        scope = {'create': 'create', 'report': 'report'}.get(self.action)
+        if self.action == 'comments' and self.request.method == 'POST':
+            scope = 'comment'
+        return [throttling.TokenBucketThrottle(scope)] if scope else []
+
     
     def list(self, request):
+        # Cursor mode: `?cursor=` (empty for the first page) returns {"next", "results"}
+        cursor = request.query_params.get('cursor')
         try:
-            limit = int(request.query_params.get('limit', 10))
+            limit = _parse_limit(request.query_params, 10, minimum=1 if cursor is not None else 0)
             offset = int(request.query_params.get('offset', 0))
         except ValueError:
             return Response({"detail": "Invalid pagination parameters."}, status=status.HTTP_400_BAD_REQUEST)
-        
-        feeds = FeedService.get_feeds(offset=offset, limit=limit)
-        
-        serializer = FeedListSerializer(feeds, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+        if cursor is not None:
+            try:
+                body, etag = FeedService.get_feed_page_payload(cursor=cursor, limit=limit)
+            except ValueError:
+                return Response({"detail": "Invalid pagination parameters."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            # Offset mode is kept for older clients
+            try:
+                body, etag = FeedService.get_feed_list_payload(offset=offset, limit=limit)
+            except ValueError:
+                return Response({"detail": "Invalid pagination parameters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return self._cached_json_response(request, body, etag)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """GET /feeds/search/?q=&cursor=&limit= - active feeds matching q, best match first."""
+        try:
+            limit = _parse_limit(request.query_params, 10)
+        except ValueError:
+            return Response({"detail": "Invalid pagination parameters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            body, etag = FeedService.search_feeds_payload(
+                request.query_params.get('q', ''), request.query_params.get('cursor'), limit
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return self._cached_json_response(request, body, etag)
+
+    @staticmethod
+    def _cached_json_response(request, body, etag):
+        """Serves pre-rendered JSON bytes, or an empty 304 when the client already holds this ETag."""
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        # Let browsers keep the body but revalidate it on every fetch
+        response['Cache-Control'] = 'private, no-cache'
+        return response
      
 
     # def create(self, request):
@@ -116,7 +193,14 @@ class FeedViewSet(viewsets.ViewSet):
         serializer = FeedCreateSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
 
-        feed = serializer.save()  # the serializer now handles feed + images creation
+        try:
+            feed = FeedService.create_feed(
+                user=request.user,
+                text_content=serializer.validated_data.get('text_content', ''),
+                images=serializer.validated_data.get('images', []),
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         return Response(FeedListSerializer(feed).data, status=status.HTTP_201_CREATED)
 
@@ -133,8 +217,11 @@ class FeedViewSet(viewsets.ViewSet):
             
         return Response({"detail": "Feed reported successfully."}, status=status.HTTP_200_OK)
         
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['get', 'post'])
     def comments(self, request, pk=None):
+        if request.method == 'GET':
+            return self._list_comments(request, pk)
+
         serializer = CommentSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
@@ -146,4 +233,271 @@ class FeedViewSet(viewsets.ViewSet):
             )
             return Response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
         except ValueError as e:
-            return Response({"detail": str(e)}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+            return Response({"detail": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+    def _list_comments(self, request, pk):
+        """GET /feeds/{id}/comments/?cursor=&limit= - keyset pages of the full thread, newest first."""
+        try:
+            limit = _parse_limit(request.query_params, 20)
+        except ValueError:
+            return Response({"detail": "Invalid pagination parameters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page = CommentService.get_comments_page(feed_id=pk, cursor=request.query_params.get('cursor'), limit=limit)
+        except ValueError:
+            return Response({"detail": "Invalid pagination parameters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if page is None:
+            return Response({"detail": "Feed not found or is inactive."}, status=status.HTTP_404_NOT_FOUND)
+
+        comments, next_cursor = page
+        return Response({'next': next_cursor, 'results': CommentSerializer(comments, many=True).data}, status=status.HTTP_200_OK)
+
+
+class UploadViewSet(viewsets.ViewSet):
+    """
+    Resumable chunked image uploads:
+      POST   /uploads/            {filename, total_size} -> session
+      GET    /uploads/{id}/       current offset, to resume after a failure
+      PATCH  /uploads/{id}/       raw bytes, `Upload-Offset` header -> session
+      DELETE /uploads/{id}/       abandon
+      POST   /uploads/finalize/   {text_content, upload_ids} -> new feed
+    Chunk bodies are streamed to disk and never parsed, so request.data must not be touched in PATCH.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_throttles(self):
+        # Finalizing posts a feed, so it shares the create bucket
+        return [throttling.TokenBucketThrottle('create')] if self.action == 'finalize' else []
+
+    def create(self, request):
+        serializer = UploadStartSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = UploadService.start_upload(request.user, **serializer.validated_data)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        session = UploadService.get_upload(pk, request.user)
+        if not session:
+            return Response({"detail": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_200_OK)
+
+    def partial_update(self, request, pk=None):
+        session = UploadService.get_upload(pk, request.user)
+        if not session:
+            return Response({"detail": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({"detail": "Upload-Offset header is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.stream is None:
+            return Response({"detail": "Empty chunk."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            updated = UploadService.append_chunk(session, offset, request.stream)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if updated is None:
+            # Stale offset (retry or concurrent chunk): tell the client where to resume
+            session.refresh_from_db()
+            return Response(UploadSessionSerializer(session).data, status=status.HTTP_409_CONFLICT)
+        return Response(UploadSessionSerializer(updated).data, status=status.HTTP_200_OK)
+
+    def destroy(self, request, pk=None):
+        session = UploadService.get_upload(pk, request.user)
+        if session:
+            UploadService.abort(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['post'])
+    def finalize(self, request):
+        serializer = UploadFinalizeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            feed = UploadService.finalize(
+                user=request.user,
+                text_content=serializer.validated_data['text_content'],
+                session_ids=serializer.validated_data['upload_ids'],
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(FeedListSerializer(feed).data, status=status.HTTP_201_CREATED)
+
+
+class ArchivedFeedViewSet(viewsets.ViewSet):
+    """
+    Read-only moderation view of archived feeds (staff only):
+      GET /archive/feeds/?cursor=&limit=   newest first
+      GET /archive/feeds/{id}/             with images, comments and reports
+    """
+    permission_classes = [IsAdminUser]
+
+    def list(self, request):
+        try:
+            limit = _parse_limit(request.query_params, 20)
+        except ValueError:
+            return Response({"detail": "Invalid pagination parameters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            feeds, next_cursor = ArchiveService.get_archived_feeds_page(request.query_params.get('cursor'), limit)
+        except ValueError:
+            return Response({"detail": "Invalid pagination parameters."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'next': next_cursor, 'results': ArchivedFeedSerializer(feeds, many=True).data})
+
+    def retrieve(self, request, pk=None):
+        feed = ArchiveService.get_archived_feed(pk)
+        if not feed:
+            return Response({"detail": "Archived feed not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ArchivedFeedDetailSerializer(feed).data, status=status.HTTP_200_OK)
+
+
+# --- Async API (ASGI) ---
+# Native async counterparts of FeedViewSet.list, comments and report. Under ASGI they await
+# Postgres and Redis on the event loop instead of holding a thread-pool slot per request.
+# DRF viewsets are sync-only, so these are plain Django views; CSRF comes from the middleware.
+
+def _json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def _invalid_pagination():
+    return _json_response({"detail": "Invalid pagination parameters."}, status=status.HTTP_400_BAD_REQUEST)
+
+
+async def _authenticated_user(request):
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+def _not_authenticated():
+    # Same status and body DRF's SessionAuthentication produces
+    return _json_response({"detail": "Authentication credentials were not provided."}, status=status.HTTP_403_FORBIDDEN)
+
+
+async def _throttled(request, user, scope):
+    """The 429 response DRF's throttles produce when the request is over `scope`'s rate, else None."""
+    # django-redis hands out a sync client, so the bucket check hops to a thread
+    wait = await sync_to_async(throttling.take)(scope, user.pk, throttling.client_ip(request))
+    if not wait:
+        return None
+    exc = exceptions.Throttled(wait)
+    response = _json_response({"detail": exc.detail}, status=exc.status_code)
+    response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+@require_http_methods(["GET"])
+async def async_feed_list(request):
+    """GET /api/v1/async/feeds/ - same parameters, body and ETag handling as FeedViewSet.list."""
+    if await _authenticated_user(request) is None:
+        return _not_authenticated()
+
+    cursor = request.GET.get('cursor')
+    try:
+        limit = _parse_limit(request.GET, 10, minimum=1 if cursor is not None else 0)
+        offset = int(request.GET.get('offset', 0))
+    except ValueError:
+        return _invalid_pagination()
+
+    if cursor is not None:
+        try:
+            body, etag = await FeedService.aget_feed_page_payload(cursor=cursor, limit=limit)
+        except ValueError:
+            return _invalid_pagination()
+    else:
+        try:
+            body, etag = await FeedService.aget_feed_list_payload(offset=offset, limit=limit)
+        except ValueError:
+            return _invalid_pagination()
+
+    return FeedViewSet._cached_json_response(request, body, etag)
+
+
+@require_http_methods(["POST"])
+async def async_feed_report(request, pk):
+    """POST /api/v1/async/feeds/{id}/report/"""
+    user = await _authenticated_user(request)
+    if user is None:
+        return _not_authenticated()
+    throttled = await _throttled(request, user, 'report')
+    if throttled:
+        return throttled
+
+    feed = await FeedService.ahandle_report(feed_id=pk, reporting_user=user)
+
+    if not feed:
+        return _json_response({"detail": "Feed not found or is inactive."}, status=status.HTTP_404_NOT_FOUND)
+
+    if not feed.is_active:
+        return _json_response({"detail": "Feed removed due to reporting threshold."})
+
+    return _json_response({"detail": "Feed reported successfully."})
+
+
+@require_http_methods(["GET", "POST"])
+async def async_feed_comments(request, pk):
+    """GET/POST /api/v1/async/feeds/{id}/comments/ - as FeedViewSet.comments."""
+    user = await _authenticated_user(request)
+    if user is None:
+        return _not_authenticated()
+
+    if request.method == 'GET':
+        try:
+            limit = _parse_limit(request.GET, 20)
+        except ValueError:
+            return _invalid_pagination()
+
+        try:
+            page = await CommentService.aget_comments_page(feed_id=pk, cursor=request.GET.get('cursor'), limit=limit)
+        except ValueError:
+            return _invalid_pagination()
+
+        if page is None:
+            return _json_response({"detail": "Feed not found or is inactive."}, status=status.HTTP_404_NOT_FOUND)
+
+        comments, next_cursor = page
+        return _json_response({'next': next_cursor, 'results': CommentSerializer(comments, many=True).data})
+
+    throttled = await _throttled(request, user, 'comment')
+    if throttled:
+        return throttled
+
+    try:
+        data = json.loads(request.body or b'{}') if request.content_type == 'application/json' else request.POST
+    except ValueError:
+        return _json_response({"detail": "Malformed JSON body."}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = CommentSerializer(data=data)
+    if not serializer.is_valid():
+        return _json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        comment = await CommentService.acreate_comment(
+            feed_id=pk,
+            user=user,
+            text_content=serializer.validated_data['text_content']
+        )
+        return _json_response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
+    except ValueError as e:
+        return _json_response({"detail": str(e)}, status=status.HTTP_404_NOT_FOUND)
+
+
+@require_http_methods(["GET"])
+async def feed_events(request):
+    """
+    GET /api/v1/async/feeds/events/ - Server-Sent Events: feed_created (the listing entry),
+    comment_created ({feed_id, comment}), feed_removed ({id}) and resync. Serve it under ASGI.
+    """
+    if await _authenticated_user(request) is None:
+        return _not_authenticated()
+
+    response = StreamingHttpResponse(events.stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # stop nginx from buffering the stream
+    return response
@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'feed_app.middleware.MetricsMiddleware',  # first, so its timings cover every other middleware
+    'feed_app.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -95,8 +97,28 @@ DATABASES = {
         'PASSWORD': 'horilla',
         'HOST': 'localhost',
         'PORT': '5432',
+        'CONN_HEALTH_CHECKS': True,  # with the pool: every checked-out connection is verified first
+        # Per-process connection pool (Django's psycopg pool); usage is reported at /metrics
+        'OPTIONS': {
+            'pool': {
+                'min_size': 2,
+                'max_size': 10,  # per process and per alias (see 'replica' below)
+                'timeout': 10,  # seconds a request waits for a free connection before erroring
+                'max_idle': 300,  # idle connections above min_size are closed after this many seconds
+                'max_lifetime': 1800,
+            },
+        },
     }
 }
+# Listing reads go to these aliases (feed_app.db_router); writes, transactions and recent writers use 'default'.
+# Locally 'replica' is a second connection to the primary: point its HOST at a streaming replica in production.
+# It copies the pool options, so it gets a pool of its own: while both aliases share a server, each worker can
+# hold up to 2 * max_size connections there, so keep workers * 2 * max_size under Postgres' max_connections.
+DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_REPLICAS = ['replica']
+DATABASE_ROUTERS = ['feed_app.db_router.PrimaryReplicaRouter']
+DATABASE_REPLICA_PIN_SECONDS = 5  # how long a client that wrote keeps reading the primary (cover replication lag)
+
 # Redis Caching Configuration
 CACHES = {
     "default": {
@@ -104,12 +126,57 @@ CACHES = {
         "LOCATION": "redis://127.0.0.1:6379/1",
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            # One pool per process, shared by the cache, the timeline, throttles and pub/sub listeners
+            "CONNECTION_POOL_CLASS": "feed_app.utils.connections.InstrumentedConnectionPool",
+            "CONNECTION_POOL_KWARGS": {
+                "max_connections": 50,
+                "timeout": 2,  # seconds to wait for a free connection
+                "socket_connect_timeout": 2,
+                "health_check_interval": 30,  # PING connections idle for longer before reusing them
+            },
         }
     }
 }
 
+# Newest active feed ids kept in the Redis timeline (feed_app.utils.timeline); deeper pages read the DB
+FEED_TIMELINE_MAX_SIZE = 10_000
+
+# Rendered list pages kept in each worker's memory in front of Redis (feed_app.utils.local_cache); 0 turns it off
+FEED_LOCAL_CACHE_SIZE = 64  # pages per process, least recently used evicted first
+FEED_LOCAL_CACHE_TTL = 2  # seconds; bounds staleness should an invalidation broadcast be missed
+
+# Server-Sent Events stream (/api/v1/async/feeds/events/)
+FEED_EVENTS_QUEUE_SIZE = 100  # per client; a client that falls further behind is told to resync
+FEED_EVENTS_HEARTBEAT_SECONDS = 15
+
+# `manage.py archive_feeds` moves deactivated feeds, and feeds older than this, into the archive tables
+FEED_ARCHIVE_AFTER_DAYS = 365
+FEED_ARCHIVE_BATCH_SIZE = 500
+
+# Request metrics (feed_app.middleware.MetricsMiddleware), served in the Prometheus format at /metrics
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']  # scraper addresses; None serves /metrics to every client
+METRICS_SLOW_REQUEST_SECONDS = None  # e.g. 0.5 logs slower requests with their SQL (feed_app.slow_requests)
+
+# Token buckets for the write endpoints (feed_app.utils.throttling): 'N/period' allows bursts of N
+# and refills at N per period (s, min, hour, day). Each request must fit both its user's and its IP's bucket.
+FEED_THROTTLE_RATES = {
+    'create': {'user': '10/min', 'ip': '30/min'},
+    'comment': {'user': '30/min', 'ip': '90/min'},
+    'report': {'user': '20/min', 'ip': '60/min'},
+}
+
 MONGO_URI = "mongodb://localhost:27017/"
 MONGO_DB = "social_fb"
+# One MongoClient per process, created on first use (feed_app.utils.connections.mongo_client)
+MONGO_MAX_POOL_SIZE = 10
+MONGO_TIMEOUT_MS = 2000
+
+# Error log shipping (feed_app.utils.loggers.MongoLogHandler); requests never wait on Mongo
+MONGO_LOG_QUEUE_SIZE = 10_000  # records beyond this are dropped (and counted)
+MONGO_LOG_BATCH_SIZE = 100
+MONGO_LOG_FLUSH_SECONDS = 2.0
+MONGO_LOG_SPOOL_DIR = BASE_DIR / 'log_spool'  # where batches go while Mongo is unreachable
+MONGO_LOG_SPOOL_MAX_BYTES = 50 * 1024 * 1024
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -124,7 +191,8 @@ LOGGING = {
     },
     'loggers': {
         'backend_error_logger': {'handlers': ['console', 'mongo'], 'level': 'ERROR', 'propagate': True,},
-        'django': {'handlers': ['console'], 'level': 'INFO', 'propagate': True,}
+        'django': {'handlers': ['console'], 'level': 'INFO', 'propagate': True,},
+        'feed_app.slow_requests': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False,},
     }
 }
 
@@ -135,6 +203,8 @@ REST_FRAMEWORK = {
     'EXCEPTION_HANDLER': 'feed_app.utils.loggers.custom_exception_handler',
     'PAGE_SIZE': 10 
 }
+# Largest `limit` a paginated endpoint serves; bigger requests get this many
+FEED_MAX_PAGE_SIZE = 100
 
 # Authentication URLs for Django's built-in system
 LOGIN_URL = '/login/' 
@@ -182,4 +252,14 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media' # Directory where uploaded files are stored
 
+# Threads per process rendering thumbnail/medium/WebP variants of uploaded images
+IMAGE_VARIANT_WORKERS = 2
+
+# Resumable chunked image uploads (/api/v1/uploads/)
+FEED_UPLOAD_TEMP_DIR = MEDIA_ROOT.parent / 'upload_sessions'  # keep on the same filesystem as MEDIA_ROOT
+FEED_UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+FEED_UPLOAD_MAX_CHUNK_BYTES = 5 * 1024 * 1024
+FEED_UPLOAD_MAX_PIXELS = 40_000_000
+FEED_UPLOAD_SESSION_TTL_HOURS = 24
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -27,7 +27,10 @@
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from feed_app.views import FeedViewSet, feed_list_ui, user_signup, user_login, user_logout
+from feed_app.views import (
+    FeedViewSet, UploadViewSet, ArchivedFeedViewSet, feed_list_ui, user_signup, user_login, user_logout,
+    async_feed_list, async_feed_comments, async_feed_report, feed_events, metrics_view,
+)
 # IMPORT: Import settings and static for media files
 from django.conf import settings
 from django.conf.urls.static import static
@@ -35,6 +38,8 @@ from django.conf.urls.static import static
 # DRF Router for API endpoints
 router = DefaultRouter()
 router.register(r'feeds', FeedViewSet, basename='feed')
+router.register(r'uploads', UploadViewSet, basename='upload')
+router.register(r'archive/feeds', ArchivedFeedViewSet, basename='archived-feed')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -47,6 +52,14 @@ urlpatterns = [
     
     # Backend/API path
     path('api/v1/', include(router.urls)), 
+
+    # Native async endpoints for the hot read/report paths (serve with an ASGI server, e.g. uvicorn)
+    path('api/v1/async/feeds/', async_feed_list, name='async_feed_list'),
+    path('api/v1/async/feeds/<int:pk>/comments/', async_feed_comments, name='async_feed_comments'),
+    path('api/v1/async/feeds/<int:pk>/report/', async_feed_report, name='async_feed_report'),
+    path('api/v1/async/feeds/events/', feed_events, name='feed_events'),
+
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 # --- FIX: Serve media files only during local development (DEBUG=True) ---